@@ -1,14 +1,16 @@
 import cv2
 import numpy as np
 from scipy.signal import find_peaks
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Tuple
 import os
 
 # Kendi modüllerimizi import et
-from product_detector import detect_products_in_shelf
-from shelf_detector import create_shelf_mask
+from product_detector import detect_products_in_shelf, detect_products_in_shelves
+from shelf_detector import create_shelf_mask, classify_shelf
 from buzdolabi_detector import extract_refrigerator_region
 from model_config import get_segmentation_model, get_detection_model, DETECTION_MODEL
+from inference_profile import INFERENCE_SETTINGS
+from detections import Detections
 # Product dimensions removed - not needed
 from ultralytics import YOLO
 
@@ -47,6 +49,7 @@ def analyze_full_image(image):
             "toplam_urun": sum(shelf_products.values()) if shelf_products else 0,
             "raf_bilgileri": shelf_results,
             "gorsel": final_image,  # Web uygulaması bu ismi arıyor
+            "tespitler": known_boxes,  # Detections (JSON/NPZ/Arrow dışa aktarımı için)
             # Alan/kaplama hesapları ve ham kutular arayüzde kullanılmıyor
         }
         
@@ -54,6 +57,58 @@ def analyze_full_image(image):
         print(f"Tam görsel analiz hatası: {e}")
         return {"error": f"Görsel analiz hatası: {str(e)}"}
 
+def find_shelf_boundaries(refrigerator_crop):
+    """
+    Beyaz raf maskesinin dikey projeksiyonundan raf sınırlarını bulur
+    
+    Args:
+        refrigerator_crop: BGR formatında buzdolabı görseli
+        
+    Returns:
+        tuple: (raf_maskesi, sıralı raf sınırları; üst ve alt kenar dahil)
+    """
+    shelf_mask = create_shelf_mask(refrigerator_crop)
+    
+    # Dikey projeksiyon ile raf sınırlarını bul - ULTRA SIKI PARAMETRELER
+    vertical_projection = np.sum(shelf_mask, axis=1)
+    shelf_boundaries, _ = find_peaks(
+        vertical_projection, 
+        distance=250,      # Raflar arası minimum mesafe maksimum
+        prominence=25000,  # Prominence ultra yüksek (sadece ana raflar)
+        height=30000       # Minimum yükseklik ultra yüksek
+    )
+    
+    # Üst/alt sınırları da ekle (üst rafı kaçırmamak için)
+    height = refrigerator_crop.shape[0]
+    shelf_boundaries = np.array([0] + list(shelf_boundaries) + [height])
+    shelf_boundaries = np.unique(shelf_boundaries)
+    shelf_boundaries = np.sort(shelf_boundaries)
+    
+    return shelf_mask, shelf_boundaries
+
+def prefilter_shelves(shelf_images, shelf_mask, shelf_ranges):
+    """
+    Profildeki eşiklerle raf ön kontrolü (prefilter kapalıysa hepsi None)
+    
+    Returns:
+        list: Her raf için None (tespit yapılmalı), "ince" veya "bos"
+    """
+    if not INFERENCE_SETTINGS["prefilter"]:
+        return [None] * len(shelf_ranges)
+    
+    return [
+        classify_shelf(
+            shelf_images[i],
+            shelf_mask[start:end, :],
+            min_height=INFERENCE_SETTINGS["min_shelf_height"],
+            skip_empty=INFERENCE_SETTINGS["skip_empty_shelves"],
+            empty_white_ratio=INFERENCE_SETTINGS["empty_white_ratio"],
+            empty_edge_density=INFERENCE_SETTINGS["empty_edge_density"],
+            empty_white_edge_density=INFERENCE_SETTINGS["empty_white_edge_density"]
+        )
+        for i, (start, end) in enumerate(shelf_ranges)
+    ]
+
 def raf_analizi_yap(image, enhance: bool = False, use_ensemble: bool = False) -> Dict[str, Any]:
     """
     Buzdolabı görselini analiz ederek raf bazlı ürün tespiti yapar
@@ -66,6 +121,30 @@ def raf_analizi_yap(image, enhance: bool = False, use_ensemble: bool = False) ->
     Returns:
         Dict: Analiz sonuçları
     """
+    sonuc = {"error": "Raf analizi hatası: sonuç üretilemedi"}
+    for olay, veri in raf_analizi_akisi(image, enhance=enhance, use_ensemble=use_ensemble):
+        if olay == "sonuc":
+            sonuc = veri
+    return sonuc
+
+def raf_analizi_akisi(image, enhance: bool = False, use_ensemble: bool = False) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    raf_analizi_yap ile aynı analizi adım adım olay olarak üretir
+    
+    Olaylar (sırasıyla):
+        "buzdolabi": Buzdolabı bölgesi bulundu / bulunamadı
+        "raf_sinirlari": Raf sınırları belirlendi
+        "raf": Her raf analiz edildikçe raf sonucu
+        "sonuc": raf_analizi_yap'ın döndürdüğü sonuç sözlüğü (hata dahil)
+    
+    Args:
+        image: RGB veya BGR formatında görsel
+        enhance: Kontrast iyileştirme (kullanılmıyor)
+        use_ensemble: Ensemble tahmin (kullanılmıyor)
+        
+    Yields:
+        tuple: (olay_adı, veri)
+    """
     try:
         # RGB formatından BGR'ye çevir (OpenCV için)
         if len(image.shape) == 3 and image.shape[2] == 3:
@@ -80,50 +159,82 @@ def raf_analizi_yap(image, enhance: bool = False, use_ensemble: bool = False) ->
         # Eğer buzdolabı tespit edilemezse, tüm görseli kullan
         if refrigerator_crop is None:
             print("⚠️ Buzdolabı tespit edilemedi, tüm görsel analiz ediliyor...")
-            return analyze_full_image(processed_image)
+            yield "buzdolabi", {
+                "bulundu": False,
+                "genislik": processed_image.shape[1],
+                "yukseklik": processed_image.shape[0]
+            }
+            sonuc = analyze_full_image(processed_image)
+            for shelf_result in sonuc.get("raf_bilgileri", []):
+                yield "raf", shelf_result
+            yield "sonuc", sonuc
+            return
 
-        # 3. Beyaz rafları tespit et
-        shelf_mask = create_shelf_mask(refrigerator_crop)
-        
-        # Dikey projeksiyon ile raf sınırlarını bul - ULTRA SIKI PARAMETRELER
-        vertical_projection = np.sum(shelf_mask, axis=1)
-        shelf_boundaries, _ = find_peaks(
-            vertical_projection, 
-            distance=250,      # Raflar arası minimum mesafe maksimum
-            prominence=25000,  # Prominence ultra yüksek (sadece ana raflar)
-            height=30000       # Minimum yükseklik ultra yüksek
-        )
-        
-        # Üst/alt sınırları da ekle (üst rafı kaçırmamak için)
-        height = refrigerator_crop.shape[0]
-        shelf_boundaries = np.array([0] + list(shelf_boundaries) + [height])
-        shelf_boundaries = np.unique(shelf_boundaries)
-        shelf_boundaries = np.sort(shelf_boundaries)
+        yield "buzdolabi", {
+            "bulundu": True,
+            "genislik": refrigerator_crop.shape[1],
+            "yukseklik": refrigerator_crop.shape[0]
+        }
+
+        # 3. Beyaz rafları ve raf sınırlarını tespit et
+        shelf_mask, shelf_boundaries = find_shelf_boundaries(refrigerator_crop)
 
         print(f"✅ {len(shelf_boundaries)} raf sınırı bulundu")
         
         if len(shelf_boundaries) < 2:
             print("❌ Yeterli raf sınırı bulunamadı")
-            return {"error": "Raf sınırları tespit edilemedi"}
+            yield "sonuc", {"error": "Raf sınırları tespit edilemedi"}
+            return
 
         # 4. Her rafı ayrı ayrı analiz et (AYNI MODEL İLE)
         total_products = 0
         shelf_results = []
+        shelf_detection_parts = []
         
 
 
-        for shelf_index in range(len(shelf_boundaries) - 1):
+        # Raf görsellerini kırp (profildeki batch boyutunda birlikte tespit edilir)
+        shelf_ranges = [
+            (shelf_boundaries[i], shelf_boundaries[i + 1])
+            for i in range(len(shelf_boundaries) - 1)
+        ]
+        shelf_images = [refrigerator_crop[start:end, :] for start, end in shelf_ranges]
+        
+        # Ön kontrol: boş ve çok ince raflarda dedektörü çalıştırma
+        shelf_states = prefilter_shelves(shelf_images, shelf_mask, shelf_ranges)
+        
+        skipped_count = sum(1 for state in shelf_states if state is not None)
+        if skipped_count:
+            print(f"⏭️ {skipped_count}/{len(shelf_states)} raf atlandı: {shelf_states}")
+        
+        yield "raf_sinirlari", {
+            "sinirlar": [int(boundary) for boundary in shelf_boundaries],
+            "raf_sayisi": len(shelf_ranges),
+            "atlanan_raf": skipped_count
+        }
+        
+        shelf_detections = detect_products_in_shelves(
+            [image for image, state in zip(shelf_images, shelf_states) if state is None],
+            DETECTION_MODEL
+        )
 
+        for shelf_index, (shelf_start, shelf_end) in enumerate(shelf_ranges):
+            shelf_image = shelf_images[shelf_index]
+            shelf_state = shelf_states[shelf_index]
             
-            # Raf görselini kırp
-            shelf_start = shelf_boundaries[shelf_index]
-            shelf_end = shelf_boundaries[shelf_index + 1]
-            shelf_image = refrigerator_crop[shelf_start:shelf_end, :]
+            # Atlanan raflar için tespit ve çizim yapılmaz
+            if shelf_state is not None:
+                shelf_results.append({
+                    "raf_no": shelf_index + 1,
+                    "urunler": {},
+                    "bilinmeyen_kutular": [],
+                    "atlandi": shelf_state
+                })
+                yield "raf", shelf_results[-1]
+                continue
             
-            # Bu raftaki ürünleri tespit et
-            product_counts, shelf_total, unknown_boxes, known_boxes = detect_products_in_shelf(
-                shelf_image, DETECTION_MODEL
-            )
+            # Bu raftaki ürünler
+            product_counts, shelf_total, unknown_boxes, known_boxes = next(shelf_detections)
             
             total_products += shelf_total
             
@@ -148,8 +259,12 @@ def raf_analizi_yap(image, enhance: bool = False, use_ensemble: bool = False) ->
             shelf_results.append({
                 "raf_no": shelf_index + 1,
                 "urunler": shelf_products,
-                "bilinmeyen_kutular": unknown_boxes
+                "bilinmeyen_kutular": unknown_boxes.boxes().tolist()
             })
+            
+            # Tüm görsel için tespitler (buzdolabı koordinatlarında)
+            shelf_detection_parts.append(known_boxes.shifted(dy=int(shelf_start)))
+            yield "raf", shelf_results[-1]
 
         # BGR'den RGB'ye çevir (web görünümü için)
         final_image = cv2.cvtColor(refrigerator_crop, cv2.COLOR_BGR2RGB)
@@ -157,10 +272,13 @@ def raf_analizi_yap(image, enhance: bool = False, use_ensemble: bool = False) ->
 
 
         # Sonuçları döndür
-        return {
+        yield "sonuc", {
             "toplam_urun": total_products,
             "raf_bilgileri": shelf_results,
+            "atlanan_raf": skipped_count,
+            "raf_atlama_orani": skipped_count / len(shelf_ranges),
             "gorsel": final_image,  # Web uygulaması bu ismi arıyor
+            "tespitler": Detections.concatenate(shelf_detection_parts),  # JSON/NPZ/Arrow dışa aktarımı için
             "kaplama_yuzdesi": 0.0,  # Web uyumluluğu için
             "boxes_xyxy": [],        # Web uyumluluğu için
             "classes": [],           # Web uyumluluğu için
@@ -169,7 +287,7 @@ def raf_analizi_yap(image, enhance: bool = False, use_ensemble: bool = False) ->
 
     except Exception as e:
         print(f"❌ Analiz hatası: {e}")
-        return {"error": f"Raf analizi hatası: {str(e)}"}
+        yield "sonuc", {"error": f"Raf analizi hatası: {str(e)}"}
 
 def draw_product_boxes(shelf_image, known_boxes, unknown_boxes):
     """
@@ -177,8 +295,8 @@ def draw_product_boxes(shelf_image, known_boxes, unknown_boxes):
     
     Args:
         shelf_image: Raf görseli
-        known_boxes: Bilinen ürün kutuları
-        unknown_boxes: Bilinmeyen ürün kutuları
+        known_boxes: Bilinen ürün kutuları (Detections)
+        unknown_boxes: Bilinmeyen ürün kutuları (Detections)
         
     Returns:
         Kutuları çizilmiş görsel
@@ -188,13 +306,9 @@ def draw_product_boxes(shelf_image, known_boxes, unknown_boxes):
         drawn_positions = []
         
         # Bilinen ürünler için yeşil kutular
-        for item in known_boxes:
-            if len(item) == 6:  # Format: (x1, y1, x2, y2, cls_name, confidence)
-                x1, y1, x2, y2, product_name, confidence = item
-                label = f"{product_name}: {confidence:.2f}"
-            else:  # Eski format: (x1, y1, x2, y2, cls_name)
-                x1, y1, x2, y2, product_name = item
-                label = product_name
+        for x1, y1, x2, y2, class_id, confidence in known_boxes.array.tolist():
+            product_name = known_boxes.classes.name_of(class_id)
+            label = f"{product_name}: {confidence:.2f}"
             
             # Bu pozisyonda daha önce etiket çizilmiş mi kontrol et
             current_pos = (x1, y1, x2, y2)
@@ -221,8 +335,7 @@ def draw_product_boxes(shelf_image, known_boxes, unknown_boxes):
                 print(f"✅ ETİKET ÇİZİLDİ: {label} at ({x1},{y1})-({x2},{y2})")
 
         # Bilinmeyen ürünler için kırmızı kutular
-        for box_coords in unknown_boxes:
-            x1, y1, x2, y2 = box_coords
+        for x1, y1, x2, y2 in unknown_boxes.boxes().tolist():
             
             # Kırmızı dikdörtgen çiz
             cv2.rectangle(shelf_image, (x1, y1), (x2, y2), (0, 0, 255), 2)
@@ -0,0 +1,310 @@
+"""
+Çıkarım parametreleri için otomatik ayarlayıcı.
+
+Bu makinede giriş boyutu (imgsz), batch boyutu, torch intra-op thread
+sayısı ve worker süreç sayısı kombinasyonlarını ölçer. Ölçülen iş,
+pipeline'ın kendisidir: her örnek görselin raf dilimleri üzerinde
+detect_products_in_shelves (buzdolabı kırpma ve raf sınırları önceden
+hazırlanır). Görsel başı gecikmenin p95 değeri bütçeyi aşmayan en yüksek
+throughput'lu ayar inference_profile.json olarak yazılır. Pipeline bu
+profili başlangıçta yükler.
+
+Örnek:
+    python autotune.py --latency-budget-ms 1500
+    python autotune.py --imgsz 480 640 --batch 1 2 4 --threads 1 2 4 --workers 1 2
+"""
+import argparse
+import contextlib
+import datetime
+import importlib
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+import platform
+import sys
+import threading
+import time
+from queue import Empty
+
+from bench_common import default_images, percentile
+from inference_profile import INFERENCE_PROFILE, INFERENCE_SETTINGS
+
+def default_thread_counts(cpu_count):
+    """
+    1'den CPU sayısına kadar ikinin kuvvetleri (ve CPU sayısının kendisi)
+    """
+    counts = [2 ** i for i in range(int(math.log2(cpu_count)) + 1)]
+    if counts[-1] != cpu_count:
+        counts.append(cpu_count)
+    return counts
+
+def _prepare_shelves(image_paths):
+    """
+    Her örnek görsel için pipeline'ın dedektöre verdiği raf dilimlerini
+    hazırlar (buzdolabı kırpma, raf sınırları ve ön kontrol; ölçülmez)
+    """
+    import cv2
+    from analiz import find_shelf_boundaries, prefilter_shelves
+    from buzdolabi_detector import extract_refrigerator_region
+    from model_config import get_segmentation_model
+
+    segmentation_model = get_segmentation_model()
+    work = []
+    for path in image_paths:
+        image = cv2.imread(path)
+        refrigerator_crop = extract_refrigerator_region(image, segmentation_model)
+        if refrigerator_crop is None:
+            work.append([image])  # Pipeline tüm görseli analiz eder
+            continue
+
+        shelf_mask, shelf_boundaries = find_shelf_boundaries(refrigerator_crop)
+        shelf_ranges = list(zip(shelf_boundaries[:-1], shelf_boundaries[1:]))
+        shelf_images = [refrigerator_crop[start:end, :] for start, end in shelf_ranges]
+        shelf_states = prefilter_shelves(shelf_images, shelf_mask, shelf_ranges)
+        work.append([shelf for shelf, state in zip(shelf_images, shelf_states) if state is None])
+    return work
+
+def _benchmark_worker(model_path, image_paths, imgsz, batch, threads, rounds, barrier, queue):
+    """
+    Ayrı süreçte pipeline'ın tespit adımını (detect_products_in_shelves)
+    her görselin raf dilimleri üzerinde ölçer; gecikme görsel başınadır.
+    Hazır olunca ("hazir",), bitince ("tamam", ...), hata olursa ("hata", mesaj) gönderir.
+    """
+    try:
+        # Ölçülen ayarları pipeline'ın okuduğu profile uygula
+        INFERENCE_SETTINGS.update({"imgsz": imgsz, "batch": batch, "threads": threads})
+        import torch
+        torch.set_num_threads(threads)
+
+        # Yük testindeki gibi ANALIZ_MODULE=stub_backend ile sahte modeller kullanılabilir
+        if os.environ.get("ANALIZ_MODULE"):
+            importlib.import_module(os.environ["ANALIZ_MODULE"])
+        from product_detector import detect_products_in_shelves
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            work = _prepare_shelves(image_paths)
+
+            # Isınma (ilk çağrı model başlatma maliyetini içerir)
+            list(detect_products_in_shelves(work[0], model_path))
+            queue.put(("hazir",))
+            barrier.wait()
+
+            latencies = []
+            box_count = 0
+            for _ in range(rounds):
+                for shelf_images in work:
+                    start = time.perf_counter()
+                    for _, _, _, known_boxes in detect_products_in_shelves(shelf_images, model_path):
+                        box_count += len(known_boxes)
+                    latencies.append(time.perf_counter() - start)
+
+        queue.put(("tamam", latencies, box_count, len(work) * rounds))
+    except threading.BrokenBarrierError:
+        pass  # Ana süreç ölçümü iptal etti
+    except Exception as e:
+        queue.put(("hata", f"{type(e).__name__}: {e}"))
+
+def _collect(queue, processes, count, deadline):
+    """
+    Worker'lardan count mesaj toplar
+
+    Raises:
+        RuntimeError: Worker hata bildirirse, beklenmedik şekilde sonlanırsa
+            veya süre dolarsa
+    """
+    messages = []
+    while len(messages) < count:
+        try:
+            message = queue.get(timeout=1)
+        except Empty:
+            exitcodes = [p.exitcode for p in processes if p.exitcode not in (None, 0)]
+            if exitcodes:
+                raise RuntimeError(f"Worker beklenmedik şekilde sonlandı (çıkış kodu {exitcodes[0]})")
+            if time.monotonic() > deadline:
+                raise RuntimeError("Worker zaman aşımına uğradı")
+            continue
+        if message[0] == "hata":
+            raise RuntimeError(message[1])
+        messages.append(message)
+    return messages
+
+def measure(model_path, image_paths, imgsz, batch, threads, workers, rounds, timeout):
+    """
+    Tek bir kombinasyonu ölçer
+
+    Returns:
+        Dict: p50/p95 görsel başı gecikme (ms), throughput (görsel/s), tespit sayısı.
+        Ölçüm başarısız olursa yalnızca "hata" anahtarı döner.
+    """
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers + 1)
+    queue = ctx.Queue()
+    processes = [
+        ctx.Process(
+            target=_benchmark_worker,
+            args=(model_path, image_paths, imgsz, batch, threads, rounds, barrier, queue)
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    deadline = time.monotonic() + timeout
+    try:
+        # Tüm worker'lar ısındıktan sonra saati başlat
+        _collect(queue, processes, workers, deadline)
+        barrier.wait(timeout=max(1.0, deadline - time.monotonic()))
+        start = time.perf_counter()
+        outputs = _collect(queue, processes, workers, deadline)
+        elapsed = time.perf_counter() - start
+    except (RuntimeError, threading.BrokenBarrierError) as e:
+        barrier.abort()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        return {"hata": str(e) or "Worker senkronizasyonu bozuldu"}
+    finally:
+        for process in processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    latencies = sorted(l * 1000.0 for output in outputs for l in output[1])
+    # Worker'lar aynı görselleri işler; tespit sayısı için birini kullan
+    box_count = outputs[0][2] // rounds
+    image_count = sum(output[3] for output in outputs)
+
+    return {
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "throughput_ips": round(image_count / elapsed, 2) if elapsed > 0 else 0.0,
+        "tespit_sayisi": box_count,
+    }
+
+def choose_best(measurements, latency_budget_ms, reference_boxes, max_count_drift):
+    """
+    Bütçeyi aşmayan ve tespit sayısı referanstan fazla sapmayan ölçümler
+    arasından en yüksek throughput'lusunu seçer. Hiçbiri bütçeye uymazsa
+    en düşük p95 gecikmeli ölçümü döndürür.
+    """
+    accurate = [
+        m for m in measurements
+        if reference_boxes == 0
+        or abs(m["tespit_sayisi"] - reference_boxes) / reference_boxes <= max_count_drift
+    ] or measurements
+
+    within_budget = [m for m in accurate if m["p95_ms"] <= latency_budget_ms]
+    if within_budget:
+        return max(within_budget, key=lambda m: m["throughput_ips"])
+
+    print("⚠️ Hiçbir ayar gecikme bütçesine uymadı, en düşük gecikmeli seçiliyor")
+    return min(accurate, key=lambda m: m["p95_ms"])
+
+def main():
+    cpu_count = os.cpu_count() or 1
+
+    parser = argparse.ArgumentParser(description="Çıkarım parametreleri otomatik ayarlayıcı")
+    parser.add_argument("--model", default=None, help="Model yolu (varsayılan: model_config.DETECTION_MODEL)")
+    parser.add_argument("--images", nargs="+", help="Örnek görseller (varsayılan: examples/)")
+    parser.add_argument("--imgsz", nargs="+", type=int, default=[480, 640, 800],
+                        help="Denenecek giriş boyutları (modelin kendi boyutu her zaman ölçülür)")
+    parser.add_argument("--batch", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--threads", nargs="+", type=int, default=default_thread_counts(cpu_count))
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--rounds", type=int, default=3, help="Her ayar için görsel seti tekrar sayısı")
+    parser.add_argument("--latency-budget-ms", type=float, default=2000.0,
+                        help="Görsel başı p95 gecikme için üst sınır")
+    parser.add_argument("--max-count-drift", type=float, default=0.05,
+                        help="Model varsayılan imgsz'sine göre izin verilen tespit sayısı sapması (oran)")
+    parser.add_argument("--timeout", type=float, default=600.0,
+                        help="Her kombinasyon için süre sınırı (saniye)")
+    parser.add_argument("--output", default=INFERENCE_PROFILE)
+    args = parser.parse_args()
+
+    if args.model is None:
+        from model_config import DETECTION_MODEL
+        args.model = DETECTION_MODEL
+
+    image_paths = args.images or default_images()
+    if not image_paths:
+        parser.error("Örnek görsel bulunamadı")
+
+    # None: imgsz verilmez, model eğitim boyutunu kullanır (doğruluk referansı)
+    imgsz_values = [None] + [imgsz for imgsz in args.imgsz if imgsz]
+
+    # Thread x worker toplamı CPU sayısını aşan kombinasyonları atla
+    combinations = [
+        (imgsz, batch, threads, workers)
+        for imgsz, batch, threads, workers in itertools.product(
+            imgsz_values, args.batch, args.threads, args.workers
+        )
+        if threads * workers <= cpu_count
+    ]
+    print(f"🚀 {len(combinations)} kombinasyon ölçülecek ({cpu_count} CPU, {len(image_paths)} görsel)")
+
+    measurements = []
+    failures = []
+    for imgsz, batch, threads, workers in combinations:
+        result = measure(
+            args.model, image_paths, imgsz, batch, threads, workers, args.rounds, args.timeout
+        )
+        result.update({"imgsz": imgsz, "batch": batch, "threads": threads, "workers": workers})
+        if "hata" in result:
+            # Başarısız kombinasyonu kaydet ve taramaya devam et
+            failures.append(result)
+            print(
+                f"   ❌ imgsz={imgsz} batch={batch} threads={threads} workers={workers}: "
+                f"{result['hata']}"
+            )
+            continue
+        measurements.append(result)
+        print(
+            f"   imgsz={imgsz} batch={batch} threads={threads} workers={workers}: "
+            f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+            f"{result['throughput_ips']} görsel/s, {result['tespit_sayisi']} tespit"
+        )
+
+    if not combinations:
+        parser.error("Ölçülecek kombinasyon yok (threads x workers CPU sayısını aşıyor)")
+    if not measurements:
+        print(f"❌ Tüm kombinasyonlar başarısız oldu ({len(failures)}), profil yazılmadı")
+        sys.exit(1)
+
+    # Doğruluk referansı: modelin kendi imgsz'si ile yapılan tespit sayısı
+    # (önceki profilden bağımsız, böylece ardışık ayarlamalarda sapma birikmez)
+    reference = [m for m in measurements if m["imgsz"] is None]
+    reference_boxes = reference[0]["tespit_sayisi"] if reference else 0
+
+    best = choose_best(measurements, args.latency_budget_ms, reference_boxes, args.max_count_drift)
+
+    settings = dict(INFERENCE_SETTINGS)
+    settings.update({key: best[key] for key in ("imgsz", "batch", "threads", "workers")})
+
+    profile = {
+        "settings": settings,
+        "olcum": {key: best[key] for key in ("p50_ms", "p95_ms", "throughput_ips")},
+        "gecikme_butcesi_ms": args.latency_budget_ms,
+        "makine": {
+            "cpu_sayisi": cpu_count,
+            "islemci": platform.processor() or platform.machine(),
+        },
+        "tarih": datetime.datetime.now().isoformat(timespec="seconds"),
+        "tum_olcumler": measurements,
+        "basarisiz_olcumler": failures,
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False)
+
+    print(
+        f"✅ Seçilen ayar: imgsz={best['imgsz']} batch={best['batch']} "
+        f"threads={best['threads']} workers={best['workers']} "
+        f"({best['throughput_ips']} görsel/s, p95 {best['p95_ms']} ms)"
+    )
+    print(f"💾 Profil kaydedildi: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import glob
+import math
+import os
+
+# autotune.py ve load_test.py tarafından paylaşılan ölçüm yardımcıları
+
+EXAMPLES_DIR = "examples"
+
+def default_images():
+    """
+    examples/ altındaki giriş görsellerini döndürür (analiz çıktıları hariç)
+    """
+    paths = []
+    for pattern in ("*.jpeg", "*.jpg", "*.png"):
+        paths.extend(glob.glob(os.path.join(EXAMPLES_DIR, pattern)))
+    return sorted(p for p in paths if "analiz" not in os.path.basename(p))
+
+def percentile(sorted_values, p):
+    """
+    Sıralı listeden nearest-rank yöntemi ile yüzdelik değer döndürür
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
@@ -0,0 +1,205 @@
+import json
+
+import numpy as np
+
+try:
+    import pyarrow
+except ImportError:  # Arrow dışa aktarımı isteğe bağlı
+    pyarrow = None
+
+# Tek bir tespitin kaydı: kutu koordinatları, sınıf id'si ve confidence.
+# Sınıf isimleri kutu başına tekrarlanmaz, ClassTable üzerinden çözülür.
+DETECTION_DTYPE = np.dtype([
+    ("x1", np.int32),
+    ("y1", np.int32),
+    ("x2", np.int32),
+    ("y2", np.int32),
+    ("class_id", np.int16),
+    ("conf", np.float32),
+])
+
+# Modelde karşılığı olmayan sınıflar için id
+UNKNOWN_CLASS_ID = -1
+UNKNOWN_CLASS_NAME = "bilinmeyen"
+
+class ClassTable:
+    """
+    Sınıf id'si -> sınıf ismi tablosu (aynı modelin tüm tespitleri paylaşır)
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self._ids = {name: class_id for class_id, name in enumerate(self.names)}
+
+    @classmethod
+    def from_model_names(cls, model_names):
+        """
+        ultralytics {id: isim} sözlüğünden tablo oluşturur
+        """
+        size = max(model_names) + 1 if model_names else 0
+        return cls(model_names.get(class_id, UNKNOWN_CLASS_NAME) for class_id in range(size))
+
+    def __len__(self):
+        return len(self.names)
+
+    def id_of(self, name):
+        return self._ids.get(name, UNKNOWN_CLASS_ID)
+
+    def name_of(self, class_id):
+        if 0 <= class_id < len(self.names):
+            return self.names[class_id]
+        return UNKNOWN_CLASS_NAME
+
+    def flags(self, predicate):
+        """
+        Her sınıf için predicate(isim) sonucunu bool dizisi olarak döndürür
+        """
+        return np.array([bool(predicate(name)) for name in self.names], dtype=bool)
+
+class Detections:
+    """
+    Tespit listesi: DETECTION_DTYPE yapılı dizisi ve paylaşılan ClassTable
+    """
+
+    __slots__ = ("array", "classes")
+
+    def __init__(self, array, classes):
+        self.array = array
+        self.classes = classes
+
+    @classmethod
+    def empty(cls, classes=None):
+        return cls(np.empty(0, dtype=DETECTION_DTYPE), classes or ClassTable([]))
+
+    @classmethod
+    def from_arrays(cls, xyxy, class_ids, confidences, classes):
+        """
+        (N, 4) kutu, (N,) sınıf id'si ve (N,) confidence dizilerinden oluşturur
+        """
+        array = np.empty(len(class_ids), dtype=DETECTION_DTYPE)
+        array["x1"] = xyxy[:, 0]
+        array["y1"] = xyxy[:, 1]
+        array["x2"] = xyxy[:, 2]
+        array["y2"] = xyxy[:, 3]
+        array["class_id"] = class_ids
+        array["conf"] = confidences
+        return cls(array, classes)
+
+    @classmethod
+    def concatenate(cls, parts, classes=None):
+        """
+        Aynı sınıf tablosunu paylaşan tespitleri birleştirir
+        """
+        if not parts:
+            return cls.empty(classes)
+        return cls(np.concatenate([part.array for part in parts]), classes or parts[0].classes)
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        """
+        Maske, indeks dizisi, dilim veya tek indeks ile alt küme (aynı sınıf
+        tablosu). Her zaman kopya döner: alt kümeyi değiştirmek (ör. class_id
+        ataması) asıl tespitleri etkilemez.
+        """
+        if isinstance(index, (int, np.integer)):
+            index = [index]  # Tek indeks de tek elemanlı Detections döner
+        return Detections(self.array[index].copy(), self.classes)
+
+    def boxes(self):
+        """(N, 4) int32 kutu koordinatları"""
+        return np.stack(
+            [self.array["x1"], self.array["y1"], self.array["x2"], self.array["y2"]], axis=1
+        )
+
+    def shifted(self, dx=0, dy=0):
+        """Koordinatları kaydırılmış kopya (raf -> buzdolabı koordinatları için)"""
+        array = self.array.copy()
+        array["x1"] += dx
+        array["x2"] += dx
+        array["y1"] += dy
+        array["y2"] += dy
+        return Detections(array, self.classes)
+
+    def class_counts(self):
+        """
+        Sınıf bazında tespit sayıları (ilk görülme sırasına göre)
+
+        Returns:
+            Dict: {sınıf_ismi: adet}
+        """
+        class_ids, first_index, counts = np.unique(
+            self.array["class_id"], return_index=True, return_counts=True
+        )
+        order = np.argsort(first_index, kind="stable")
+        return {
+            self.classes.name_of(int(class_ids[i])): int(counts[i])
+            for i in order
+        }
+
+    def to_dict(self):
+        """
+        Sütun bazlı JSON uyumlu sözlük (sınıf isimleri bir kez yazılır)
+        """
+        return {
+            "classes": self.classes.names,
+            "boxes": self.boxes().tolist(),
+            "class_ids": self.array["class_id"].tolist(),
+            "conf": np.round(self.array["conf"].astype(float), 4).tolist(),
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def save_npz(self, path):
+        """
+        Tespitleri ve sınıf tablosunu sıkıştırılmış NPZ olarak kaydeder
+        """
+        np.savez_compressed(path, detections=self.array, classes=np.array(self.classes.names))
+
+    @classmethod
+    def load_npz(cls, path):
+        with np.load(path) as data:
+            return cls(data["detections"], ClassTable(data["classes"].tolist()))
+
+    def to_arrow(self):
+        """
+        pyarrow.Table olarak döndürür; sınıf sütunu dictionary-encoded
+        """
+        if pyarrow is None:
+            raise ImportError("Arrow dışa aktarımı için pyarrow gerekli")
+
+        class_ids = self.array["class_id"]
+        class_column = pyarrow.DictionaryArray.from_arrays(
+            pyarrow.array(class_ids, type=pyarrow.int16(), mask=class_ids < 0),
+            pyarrow.array(self.classes.names, type=pyarrow.string())
+        )
+        return pyarrow.table({
+            "x1": self.array["x1"],
+            "y1": self.array["y1"],
+            "x2": self.array["x2"],
+            "y2": self.array["y2"],
+            "class": class_column,
+            "conf": self.array["conf"],
+        })
+
+def pairwise_iou(boxes):
+    """
+    Kutular arasındaki tüm IoU değerleri (tek seferde, matris olarak)
+
+    Args:
+        boxes: (N, 4) x1, y1, x2, y2 kutular
+
+    Returns:
+        (N, N) float IoU matrisi
+    """
+    x1, y1, x2, y2 = np.asarray(boxes, dtype=np.int64).T
+
+    width = np.maximum(np.minimum.outer(x2, x2) - np.maximum.outer(x1, x1), 0)
+    height = np.maximum(np.minimum.outer(y2, y2) - np.maximum.outer(y1, y1), 0)
+    intersection = width * height
+    areas = (x2 - x1) * (y2 - y1)
+    union = (np.add.outer(areas, areas) - intersection).astype(np.float64)
+
+    return np.divide(intersection, union, out=np.zeros(union.shape), where=union > 0)
@@ -0,0 +1,61 @@
+import json
+import os
+
+# Makineye özel çıkarım profili (autotune.py tarafından yazılır)
+INFERENCE_PROFILE = os.environ.get("INFERENCE_PROFILE", "inference_profile.json")
+
+# Profil yoksa kullanılan varsayılan çıkarım parametreleri
+DEFAULT_INFERENCE_SETTINGS = {
+    "conf": 0.6,      # Normal confidence
+    "iou": 0.5,       # Normal IoU threshold
+    "imgsz": None,    # YOLO giriş boyutu (None = modelin eğitim boyutu)
+    "batch": 1,       # Tek predict çağrısında işlenen raf sayısı
+    "threads": None,  # torch intra-op thread sayısı (None = torch varsayılanı)
+    "workers": 1,     # Analiz süreç sayısı (uvicorn worker'ları veya analiz havuzu)
+    "analysis_pool": False,  # True: analiz workers sayıda ayrı süreçte, uvicorn tek süreç
+    "shm_slot_mb": 64,      # Paylaşımlı bellek slot boyutu (MB)
+    "prefilter": True,            # İnce (ve açıksa boş) rafları tespitten önce atla
+    "min_shelf_height": 30,       # Bundan ince raf dilimleri atlanır (pixel)
+    "skip_empty_shelves": False,  # Boş raf kuralları (gerçek boş raflarla doğrulanana kadar kapalı)
+    "empty_white_ratio": 0.9,     # Beyaz doluluk oranı bunu aşan raf beyaz sayılır
+    "empty_edge_density": 0.01,   # Kenar yoğunluğu bunun altındaysa raf boş
+    "empty_white_edge_density": 0.02,  # Beyaz raf, kenar yoğunluğu bunun altındaysa boş
+}
+
+def load_inference_settings(path=INFERENCE_PROFILE):
+    """
+    Çıkarım profilini okur ve varsayılanlarla birleştirir
+
+    Args:
+        path: Profil dosyası yolu (JSON)
+
+    Returns:
+        Dict: Çıkarım parametreleri
+    """
+    settings = dict(DEFAULT_INFERENCE_SETTINGS)
+    if not path or not os.path.exists(path):
+        return settings
+
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+        for key, value in profile.get("settings", {}).items():
+            if key in settings:
+                settings[key] = value
+        print(f"✅ Çıkarım profili yüklendi: {path}")
+    except (OSError, ValueError) as e:
+        print(f"❌ Çıkarım profili okunamadı: {e}")
+
+    return settings
+
+def apply_thread_settings(settings):
+    """
+    Profildeki intra-op thread sayısını torch'a uygular
+    """
+    threads = settings.get("threads")
+    if threads:
+        import torch
+        torch.set_num_threads(int(threads))
+
+# Başlangıçta bir kez yüklenir
+INFERENCE_SETTINGS = load_inference_settings()
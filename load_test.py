@@ -0,0 +1,377 @@
+"""
+web_app için uçtan uca HTTP yük testi.
+
+Varsayılan olarak uygulamayı deterministik sahte YOLO modelleriyle
+(stub_backend) ayrı bir süreçte başlatır; analiz hattının geri kalanı
+(kırpma, raf sınırları, ön kontrol, NMS, çizim) gerçek kodla çalışır,
+model ağırlıkları gerekmez. --url verilirse çalışan bir sunucuya yük uygular.
+
+Örnek:
+    python load_test.py --concurrency 16 --requests 500
+    python load_test.py --images examples/dolap_710.png:3 examples/cokludolap1.jpeg:1
+    python load_test.py --url http://127.0.0.1:8001 --server-pid 12345
+"""
+import argparse
+import glob
+import http.client
+import json
+import mimetypes
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_common import default_images, percentile
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Uygulama hata durumunda da 200 döndürür; hata şablonunu / SSE hata olayını gövdeden yakala
+APP_ERROR_MARKERS = (b'<div class="error">', b"event: hata")
+
+def parse_image_mix(specs):
+    """
+    "yol[:ağırlık]" listesini (yollar, ağırlıklar) çiftine çevirir
+    """
+    paths, weights = [], []
+    for spec in specs:
+        path, sep, weight = spec.rpartition(":")
+        if not sep or not weight.replace(".", "", 1).isdigit():
+            path, weight = spec, "1"
+        paths.append(path)
+        weights.append(float(weight))
+    return paths, weights
+
+def build_multipart(path, fields):
+    """
+    Bir görsel ve form alanlarından multipart/form-data gövdesi oluşturur
+
+    Returns:
+        tuple: (gövde, content_type)
+    """
+    boundary = uuid.uuid4().hex
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    with open(path, "rb") as f:
+        data = f.read()
+
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n".encode()
+        )
+    parts.append(
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n".encode()
+    )
+    parts.append(data)
+    parts.append(f"\r\n--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+def process_tree_pids(pid):
+    """
+    Süreç ve tüm alt süreçlerinin PID'lerini döndürür (/proc üzerinden, özyinelemeli)
+    """
+    pids = [pid]
+    for task_dir in glob.glob(f"/proc/{pid}/task/*"):
+        try:
+            with open(os.path.join(task_dir, "children")) as f:
+                children = [int(child) for child in f.read().split()]
+        except (OSError, ValueError):
+            continue
+        for child in children:
+            pids.extend(process_tree_pids(child))
+    return pids
+
+def tree_rss_kb(pid):
+    """
+    Süreç ağacının toplam anlık bellek kullanımını (VmRSS, KB) döndürür; okunamazsa None
+    """
+    total = None
+    for tree_pid in process_tree_pids(pid):
+        try:
+            with open(f"/proc/{tree_pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total = (total or 0) + int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            pass  # Örnekleme sırasında sonlanan süreç
+    return total
+
+class RssSampler:
+    """
+    Yük süresince süreç ağacının toplam RSS değerini örnekler ve tepe değeri tutar.
+    Analiz worker'ları ve uvicorn worker'ları alt süreç olduğundan tek PID yetmez.
+    """
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss_kb = tree_rss_kb(self.pid)
+            if rss_kb is not None:
+                self.peak_kb = max(self.peak_kb or 0, rss_kb)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.peak_kb
+
+def start_server(host, port, stub_latency_ms):
+    """
+    web_app'i stub analiz modülü ile ayrı süreçte başlatır ve hazır olmasını bekler.
+    İşlenmiş görseller geçici bir dizine yazılır, stop_server bu dizini siler.
+    """
+    env = dict(os.environ)
+    env["ANALIZ_MODULE"] = "stub_backend"
+    env["STUB_LATENCY_MS"] = str(stub_latency_ms)
+    env["STATIC_DIR"] = tempfile.mkdtemp(prefix="load_test_static_")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "web_app:app",
+         "--host", host, "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    process.static_dir = env["STATIC_DIR"]
+
+    base_url = f"http://{host}:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            stop_server(process)
+            raise RuntimeError(f"Sunucu başlatılamadı (çıkış kodu {process.returncode})")
+        try:
+            urllib.request.urlopen(base_url + "/", timeout=1).read()
+            return process, base_url
+        except urllib.error.HTTPError as e:
+            # Sunucu ayakta ama hata döndürüyor: beklemeden bildir
+            stop_server(process)
+            raise RuntimeError(f"Sunucu hazır değil: GET / -> HTTP {e.code}")
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+
+    stop_server(process)
+    raise RuntimeError("Sunucu 30 saniye içinde hazır olmadı")
+
+def stop_server(process, rss_kb=None):
+    """
+    Sunucuyu durdurur ve tepe bellek kullanımını (KB) döndürür
+    """
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    shutil.rmtree(process.static_dir, ignore_errors=True)
+
+    # /proc yoksa (macOS vb.) çocuk süreçlerin ru_maxrss değerini kullan (yalnızca ana süreç)
+    if rss_kb is None and resource is not None:
+        rss_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        if sys.platform == "darwin":
+            rss_kb //= 1024  # macOS byte cinsinden döndürür
+    return rss_kb
+
+def send_request(url, body, content_type, timeout):
+    """
+    Tek bir istek gönderir
+
+    Returns:
+        tuple: (http_durum_kodu, gecikme_saniye, ilk_bayt_saniye, uygulama_hatası_mı)
+    """
+    request = urllib.request.Request(
+        url, data=body, method="POST", headers={"Content-Type": content_type}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            # İlk bayt süresi: akışlı (SSE) endpoint'lerde algılanan gecikme
+            payload = response.read(1)
+            first_byte = time.perf_counter() - start
+            payload += response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        try:
+            e.read()
+        except (http.client.HTTPException, OSError):
+            pass  # Hata gövdesi yarıda kesildi; durum kodu yeterli
+        latency = time.perf_counter() - start
+        return e.code, latency, latency, False
+    except (urllib.error.URLError, OSError, http.client.HTTPException):
+        # Bağlantı hatası veya yarıda kesilen gövde (ör. SSE sırasında sunucu öldü)
+        latency = time.perf_counter() - start
+        return 0, latency, latency, False
+
+    latency = time.perf_counter() - start
+    app_error = any(marker in payload for marker in APP_ERROR_MARKERS)
+    return status, latency, first_byte, app_error
+
+def run_load(base_url, endpoints, payloads, weights, concurrency, total_requests,
+             warmup, timeout, seed):
+    """
+    Yükü uygular ve ham ölçümleri döndürür
+    """
+    rng = random.Random(seed)
+    # İstek planını önceden oluştur: görsel karışımı tekrarlanabilir olsun
+    plan = [
+        (endpoints[i % len(endpoints)], rng.choices(range(len(payloads)), weights=weights)[0])
+        for i in range(warmup + total_requests)
+    ]
+
+    for endpoint, payload_index in plan[:warmup]:
+        body, content_type = payloads[payload_index]
+        send_request(base_url + endpoint, body, content_type, timeout)
+
+    plan = plan[warmup:]
+    samples = []
+    lock = threading.Lock()
+    cursor = iter(range(len(plan)))
+
+    def worker():
+        while True:
+            with lock:
+                index = next(cursor, None)
+            if index is None:
+                return
+            endpoint, payload_index = plan[index]
+            body, content_type = payloads[payload_index]
+            sample = send_request(base_url + endpoint, body, content_type, timeout)
+            with lock:
+                samples.append((endpoint,) + sample)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(worker) for _ in range(concurrency)]
+    elapsed = time.perf_counter() - start
+
+    # Worker'daki beklenmeyen istisnalar ölçümleri sessizce eksiltmesin
+    for future in futures:
+        future.result()
+
+    return samples, elapsed
+
+def summarize(samples, elapsed):
+    """
+    Ölçümlerden throughput, gecikme yüzdelikleri ve hata oranlarını hesaplar
+    """
+    count = len(samples)
+    latencies = sorted(latency * 1000.0 for _, _, latency, _, _ in samples)
+    rate_limited = sum(1 for _, status, _, _, _ in samples if status == 429)
+    errors = sum(
+        1 for _, status, _, _, app_error in samples
+        if status != 429 and (status == 0 or status >= 400 or app_error)
+    )
+
+    per_endpoint = {}
+    for endpoint, _, latency, first_byte, _ in samples:
+        stats = per_endpoint.setdefault(endpoint, ([], []))
+        stats[0].append(latency * 1000.0)
+        stats[1].append(first_byte * 1000.0)
+
+    return {
+        "istek": count,
+        "sure_s": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "hata_orani": round(errors / count, 4) if count else 0.0,
+        "oran_429": round(rate_limited / count, 4) if count else 0.0,
+        "endpointler": {
+            endpoint: {
+                "istek": len(values),
+                "p50_ms": round(percentile(sorted(values), 50), 1),
+                "p95_ms": round(percentile(sorted(values), 95), 1),
+                "ilk_bayt_p50_ms": round(percentile(sorted(first_bytes), 50), 1),
+            }
+            for endpoint, (values, first_bytes) in per_endpoint.items()
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="web_app HTTP yük testi")
+    parser.add_argument("--url", help="Çalışan sunucu adresi (verilmezse stub sunucu başlatılır)")
+    parser.add_argument("--server-pid", type=int, help="--url ile tepe RSS ölçümü için sunucu PID'i")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--endpoint", action="append", dest="endpoints",
+                        help="Hedef endpoint (tekrarlanabilir, varsayılan: /upload)")
+    parser.add_argument("--images", nargs="+",
+                        help="Görsel karışımı: yol[:ağırlık] (varsayılan: examples/)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--stub-latency-ms", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Özeti JSON olarak kaydet")
+    args = parser.parse_args()
+
+    endpoints = args.endpoints or ["/upload"]
+    paths, weights = parse_image_mix(args.images) if args.images else (default_images(), None)
+    if not paths:
+        parser.error("Test görseli bulunamadı")
+    weights = weights or [1.0] * len(paths)
+    payloads = [build_multipart(path, {}) for path in paths]
+
+    process = None
+    base_url = args.url.rstrip("/") if args.url else None
+    if base_url is None:
+        process, base_url = start_server(args.host, args.port, args.stub_latency_ms)
+        print(f"🚀 Stub sunucu başlatıldı: {base_url} (pid {process.pid})")
+
+    server_pid = process.pid if process is not None else args.server_pid
+    sampler = RssSampler(server_pid).start() if server_pid else None
+
+    try:
+        samples, elapsed = run_load(
+            base_url, endpoints, payloads, weights, args.concurrency,
+            args.requests, args.warmup, args.timeout, args.seed
+        )
+    finally:
+        rss_kb = sampler.stop() if sampler is not None else None
+        if process is not None:
+            rss_kb = stop_server(process, rss_kb)
+
+    summary = summarize(samples, elapsed)
+    summary["eszamanlilik"] = args.concurrency
+    summary["tepe_rss_mb"] = round(rss_kb / 1024.0, 1) if rss_kb else None
+
+    print(f"📊 {summary['istek']} istek, {summary['sure_s']} s, {summary['throughput_rps']} istek/s")
+    print(f"⏱️ p50 {summary['p50_ms']} ms | p95 {summary['p95_ms']} ms | p99 {summary['p99_ms']} ms")
+    print(f"❌ Hata oranı: {summary['hata_orani']:.2%} | 429 oranı: {summary['oran_429']:.2%}")
+    print(f"💾 Tepe RSS (süreç ağacı toplamı): {summary['tepe_rss_mb']} MB")
+    for endpoint, stats in summary["endpointler"].items():
+        print(
+            f"   {endpoint}: {stats['istek']} istek, p50 {stats['p50_ms']} ms, "
+            f"p95 {stats['p95_ms']} ms, ilk bayt p50 {stats['ilk_bayt_p50_ms']} ms"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
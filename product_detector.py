@@ -2,299 +2,234 @@ from ultralytics import YOLO
 import cv2
 import numpy as np
 
-def calculate_iou(box1, box2):
+from inference_profile import INFERENCE_SETTINGS, apply_thread_settings
+from detections import Detections, ClassTable, UNKNOWN_CLASS_ID, pairwise_iou
+
+# Profildeki thread ayarını başlangıçta uygula
+apply_thread_settings(INFERENCE_SETTINGS)
+
+def custom_nms(detections, iou_threshold=0.2, cross_class_iou_threshold=0.3):
     """
-    İki kutu arasında IoU (Intersection over Union) hesaplar
+    Gelişmiş Non-Maximum Suppression uygular
+    - Aynı sınıflar için normal NMS
+    - Farklı sınıflar arası da IoU kontrolü (duplicate önleme)
     
     Args:
-        box1, box2: (x1, y1, x2, y2) formatında kutular
+        detections: Detections (yapılı dizi + sınıf tablosu)
+        iou_threshold: Aynı sınıf için IoU eşik değeri
+        cross_class_iou_threshold: Farklı sınıflar arası IoU eşik değeri
         
     Returns:
-        float: IoU değeri (0-1 arası)
+        Detections: Filtrelenmiş tespitler (confidence'a göre azalan sırada)
     """
-    x1_1, y1_1, x2_1, y2_1 = box1
-    x1_2, y1_2, x2_2, y2_2 = box2
+    if len(detections) == 0:
+        return detections
     
-    # Kesişim alanını hesapla
-    x1_intersect = max(x1_1, x1_2)
-    y1_intersect = max(y1_1, y1_2)
-    x2_intersect = min(x2_1, x2_2)
-    y2_intersect = min(y2_1, y2_2)
+    # Confidence'a göre sırala (yüksekten düşüğe, eşitlerde giriş sırası korunur)
+    order = np.argsort(-detections.array["conf"], kind="stable")
+    boxes = detections.boxes()[order]
+    class_ids = detections.array["class_id"][order]
     
-    # Kesişim yoksa IoU = 0
-    if x2_intersect <= x1_intersect or y2_intersect <= y1_intersect:
-        return 0.0
+    # Kızılay ürünleri için özel threshold - süper agresif filtreleme
+    kizil_flags = detections.classes.flags(lambda name: "kizil" in name.lower())
+    is_kizil = kizil_flags[class_ids] if len(kizil_flags) else np.zeros(len(class_ids), dtype=bool)
     
-    # Kesişim alanı
-    intersection_area = (x2_intersect - x1_intersect) * (y2_intersect - y1_intersect)
+    # Tüm IoU'lar ve eşikler bir kez hesaplanır, açgözlü geçiş matris üzerinde yapılır
+    ious = pairwise_iou(boxes)
+    same_class = class_ids[:, None] == class_ids[None, :]
+    # Farklı sınıflar için eşik: ikisi de Kızılay ise 0.15
+    cross_thresholds = np.where(is_kizil[:, None] & is_kizil[None, :], 0.15, cross_class_iou_threshold)
+    suppresses = np.where(same_class, ious >= iou_threshold, ious > cross_thresholds)
     
-    # Her kutunun alanı
-    area1 = (x2_1 - x1_1) * (y2_1 - y1_1)
-    area2 = (x2_2 - x1_2) * (y2_2 - y1_2)
+    # En yüksek confidence'lı tespitten başlayarak, kabul edilen her tespit
+    # kendisinden sonra gelen çakışanları eler. Kabul edilenlerin confidence'ı
+    # her zaman >= olduğundan ayrıca geriye dönük kontrol gerekmez.
+    # Yalnızca birini eleyebilen satırlar dolaşılır (çakışmasız kutular atlanır).
+    suppresses = np.triu(suppresses, 1)
+    keep = np.ones(len(order), dtype=bool)
+    for current in np.flatnonzero(suppresses.any(axis=1)):
+        if keep[current]:
+            keep &= ~suppresses[current]
     
-    # Birleşim alanı
-    union_area = area1 + area2 - intersection_area
+    suppressed_count = int((~keep).sum())
+    if suppressed_count:
+        print(f"❌ NMS: {suppressed_count} tespit elendi")
     
-    # IoU hesapla
-    if union_area == 0:
-        return 0.0
-    
-    return intersection_area / union_area
+    return detections[order[keep]]
 
-def custom_nms(detections, iou_threshold=0.2, cross_class_iou_threshold=0.3):
+# Model sınıflarına göre paylaşılan sınıf tabloları
+_CLASS_TABLES = {}
+
+def _class_table_for(model_names):
     """
-    Gelişmiş Non-Maximum Suppression uygular
-    - Aynı sınıflar için normal NMS
-    - Farklı sınıflar arası da IoU kontrolü (duplicate önleme)
+    Model sınıfları için paylaşılan ClassTable (aynı model = aynı tablo)
+    """
+    key = tuple(sorted(model_names.items()))
+    if key not in _CLASS_TABLES:
+        _CLASS_TABLES[key] = ClassTable.from_model_names(model_names)
+    return _CLASS_TABLES[key]
+
+def _min_confidences(class_table):
+    """
+    Ürün tipine göre ek confidence eşikleri (sınıf id'si ile indekslenir)
+    """
+    # float64: model confidence'ı eşiklerle Python float'ı gibi karşılaştırılır
+    thresholds = np.full(len(class_table), 0.5, dtype=np.float64)  # Genel minimum
+    thresholds[class_table.flags(lambda name: "kizil" in name.lower())] = 0.45  # Kızılay için daha düşük
+    thresholds[class_table.flags(lambda name: "dimes" in name.lower()) &
+               ~class_table.flags(lambda name: "kizil" in name.lower())] = 0.55  # Dimes için biraz daha yüksek
+    return thresholds
+
+def predict_arguments():
+    """
+    Profilden predict parametreleri. imgsz ayarlı değilse verilmez;
+    ultralytics bu durumda modelin eğitim boyutunu kullanır.
+    """
+    arguments = {
+        "conf": INFERENCE_SETTINGS["conf"],
+        "iou": INFERENCE_SETTINGS["iou"],
+        "verbose": False,
+    }
+    if INFERENCE_SETTINGS["imgsz"]:
+        arguments["imgsz"] = INFERENCE_SETTINGS["imgsz"]
+    return arguments
+
+def detect_products_in_shelf(shelf_image, model_path):
+    """
+    Raf görselindeki ürünleri tespit eder
     
     Args:
-        detections: [(x1, y1, x2, y2, class_name, confidence), ...] formatında liste
-        iou_threshold: Aynı sınıf için IoU eşik değeri
-        cross_class_iou_threshold: Farklı sınıflar arası IoU eşik değeri
+        shelf_image: BGR formatında raf görseli
+        model_path: YOLO model dosya yolu
         
     Returns:
-        list: Filtrelenmiş detections listesi
+        tuple: (ürün_sayıları, toplam_ürün, bilinmeyen_kutular, bilinen_kutular)
+        Kutular Detections olarak döner.
     """
-    if not detections:
-        return []
-    
-    # Confidence'a göre sırala (yüksekten düşüğe)
-    detections = sorted(detections, key=lambda x: x[5], reverse=True)
-    
-    filtered_detections = []
+    return next(detect_products_in_shelves([shelf_image], model_path))
+
+def detect_products_in_shelves(shelf_images, model_path):
+    """
+    Birden fazla raf görselinde ürün tespiti yapar. Profildeki batch
+    boyutu kadar raf tek predict çağrısında işlenir.
     
-    while detections:
-        # En yüksek confidence'lı detection'ı al
-        current_detection = detections.pop(0)
-        current_class = current_detection[4]
-        current_box = current_detection[:4]
-        current_confidence = current_detection[5]
+    Args:
+        shelf_images: BGR formatında raf görselleri listesi
+        model_path: YOLO model dosya yolu
         
-        # Bu detection'ı kabul edip etmeyeceğimizi kontrol et
-        should_keep = True
+    Yields:
+        tuple: Her raf için sırayla (ürün_sayıları, toplam_ürün, bilinmeyen_kutular, bilinen_kutular)
+    """
+    batch_size = max(1, int(INFERENCE_SETTINGS["batch"]))
+    
+    for batch_start in range(0, len(shelf_images), batch_size):
+        batch_images = shelf_images[batch_start:batch_start + batch_size]
         
-        # Daha önce kabul edilen detection'larla çakışma kontrolü
-        for accepted_detection in filtered_detections:
-            accepted_box = accepted_detection[:4]
-            accepted_class = accepted_detection[4]
-            accepted_confidence = accepted_detection[5]
-            
-            iou = calculate_iou(current_box, accepted_box)
+        try:
+            # Her predict çağrısı için yeni model yükle (daha doğru sonuç için)
+            product_model = YOLO(model_path)
             
-            # Debug: IoU hesaplama sonucunu logla
-            if iou > 0.1:  # Sadece anlamlı IoU değerlerini logla
-                print(f"🔍 IoU hesaplama: {current_class} vs {accepted_class} = {iou:.3f}")
-            
-            # Aynı sınıftan ise daha düşük threshold kullan
-            if accepted_class == current_class:
-                if iou > iou_threshold:
-                    should_keep = False
-                    print(f"❌ Aynı sınıf NMS: {current_class} (IoU: {iou:.2f} > {iou_threshold})")
-                    break
-            else:
-                # Özel durum: Kızılay ürünleri için daha agresif filtreleme
-                is_kizilay_duplicate = (
-                    ("kizil" in current_class.lower() and "kizil" in accepted_class.lower()) or
-                    ("kizilay" in current_class.lower() and "kizilay" in accepted_class.lower()) or
-                    ("kizil" in current_class.lower() and "kizilay" in accepted_class.lower()) or
-                    ("kizilay" in current_class.lower() and "kizil" in accepted_class.lower())
-                )
-                
-                # Kızılay ürünleri için özel threshold
-                effective_threshold = cross_class_iou_threshold
-                if is_kizilay_duplicate:
-                    effective_threshold = 0.15  # ÇOK ÇOK düşük threshold - süper agresif filtreleme
-                    print(f"🔍 Kızılay duplicate kontrolü: {current_class} vs {accepted_class} (IoU: {iou:.2f}, threshold: {effective_threshold})")
-                
-                # Farklı sınıftan ama yüksek IoU varsa (aynı fiziksel obje olabilir)
-                if iou > effective_threshold:
-                    # Confidence'ı daha yüksek olanı tercih et
-                    if current_confidence <= accepted_confidence:
-                        should_keep = False
-                        print(f"❌ Cross-class NMS: {current_class} vs {accepted_class} (IoU: {iou:.2f}, conf: {current_confidence:.2f} <= {accepted_confidence:.2f})")
-                        break
-                    else:
-                        # Mevcut detection daha yüksek confidence'a sahip, eskisini çıkar
-                        filtered_detections.remove(accepted_detection)
-                        print(f"✅ Cross-class replacement: {current_class} replaced {accepted_class} (IoU: {iou:.2f}, conf: {current_confidence:.2f} > {accepted_confidence:.2f})")
+            # Ürün tespiti yap - profilden gelen parametreler
+            detection_results = product_model.predict(batch_images, **predict_arguments())
+        except Exception as e:
+            print(f"Ürün tespit hatası: {e}")
+            detection_results = None
         
-        if should_keep:
-            filtered_detections.append(current_detection)
+        if not detection_results:
+            for _ in batch_images:
+                yield {}, 0, Detections.empty(), Detections.empty()
+            continue
         
-        # Kalan detection'ları kontrol et
-        remaining_detections = []
-        for detection in detections:
-            detection_box = detection[:4]
-            detection_class = detection[4]
-            detection_confidence = detection[5]
-            
-            # Current detection ile IoU kontrol et
-            iou = calculate_iou(current_box, detection_box)
-            
-            # Aynı sınıftan ise
-            if detection_class == current_class and should_keep:
-                if iou < iou_threshold:
-                    remaining_detections.append(detection)
-                else:
-                    print(f"❌ Remaining same-class filtered: {detection_class} (IoU: {iou:.2f})")
-            # Farklı sınıftan ise
-            elif detection_class != current_class:
-                # Kızılay duplicate kontrolü
-                is_kizilay_duplicate = (
-                    ("kizil" in current_class.lower() and "kizil" in detection_class.lower()) or
-                    ("kizilay" in current_class.lower() and "kizilay" in detection_class.lower()) or
-                    ("kizil" in current_class.lower() and "kizilay" in detection_class.lower()) or
-                    ("kizilay" in current_class.lower() and "kizil" in detection_class.lower())
-                )
-                
-                # Threshold belirleme
-                effective_threshold = cross_class_iou_threshold
-                if is_kizilay_duplicate:
-                    effective_threshold = 0.15  # Süper agresif
-                
-                if should_keep and iou > effective_threshold:
-                    # Confidence karşılaştır
-                    if detection_confidence <= current_confidence:
-                        print(f"❌ Remaining cross-class filtered: {detection_class} (IoU: {iou:.2f}, conf: {detection_confidence:.2f})")
-                    else:
-                        remaining_detections.append(detection)
-                else:
-                    remaining_detections.append(detection)
-            else:
-                remaining_detections.append(detection)
+        # Tüm model sınıfları (paylaşılan tablo)
+        class_table = _class_table_for(product_model.names)
         
-        detections = remaining_detections
-    
-    return filtered_detections
+        for shelf_image, result in zip(batch_images, detection_results):
+            yield _process_detection_result(result, shelf_image, class_table)
 
-def detect_products_in_shelf(shelf_image, model_path):
+def _process_detection_result(result, shelf_image, class_table):
     """
-    Raf görselindeki ürünleri tespit eder
+    Tek bir rafın YOLO sonucunu filtreler, NMS uygular ve ürünleri sayar
     
     Args:
+        result: Raf için ultralytics Results nesnesi
         shelf_image: BGR formatında raf görseli
-        model_path: YOLO model dosya yolu
+        class_table: Modelin sınıf tablosu
         
     Returns:
         tuple: (ürün_sayıları, toplam_ürün, bilinmeyen_kutular, bilinen_kutular)
     """
     try:
-        # Her raf için yeni model yükle (daha doğru sonuç için)
-        product_model = YOLO(model_path)
-        
-        # Ürün tespiti yap - optimize edilmiş parametreler
-        detection_results = product_model.predict(
-            shelf_image, 
-            conf=0.6,      # Normal confidence
-            iou=0.5,       # Normal IoU threshold
-            verbose=False
+        if result.boxes is None or len(result.boxes) == 0:
+            return {}, 0, Detections.empty(class_table), Detections.empty(class_table)
+        
+        # Model çıktısını doğrudan yapılı diziye al
+        raw_detections = Detections.from_arrays(
+            result.boxes.xyxy.cpu().numpy().astype(np.int32),
+            result.boxes.cls.cpu().numpy().astype(np.int16),
+            result.boxes.conf.cpu().numpy().astype(np.float32),
+            class_table
         )
-        
-        if not detection_results:
-            return {}, 0, [], []
-            
-        # Tüm model sınıflarını al
-        all_classes = list(product_model.names.values())
-        
-        # İlk geçiş: Tüm detection'ları topla
-        raw_detections = []
-        unknown_boxes = []
-        
-        for result in detection_results:
-            if result.boxes is None:
-                continue
-                
-            for box in result.boxes:
-                # Tespit bilgilerini al
-                class_id = int(box.cls[0])
-                product_name = result.names.get(class_id, "bilinmeyen")
-                confidence_score = float(box.conf[0])
-                
-                # Bounding box koordinatları
-                x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                
-                # Geçersiz kutu kontrolü
-                if x2 <= x1 or y2 <= y1:
-                    continue
-                
-                # Çok küçük kutuları filtrele (min 30x30 pixel - daha agresif)
-                box_width = x2 - x1
-                box_height = y2 - y1
-                if box_width < 30 or box_height < 30:
-                    print(f"❌ Çok küçük kutu filtrelendi: {box_width}x{box_height}")
-                    continue
-                
-                # Çok büyük kutuları da filtrele (muhtemelen hatalı tespit)
-                shelf_height, shelf_width = shelf_image.shape[:2]
-                if (box_width > shelf_width * 0.8) or (box_height > shelf_height * 0.8):
-                    print(f"❌ Çok büyük kutu filtrelendi: {box_width}x{box_height} (raf: {shelf_width}x{shelf_height})")
-                    continue
-                
-                # Bilinmeyen ürün kontrolü
-                if product_name not in all_classes:
-                    product_name = "bilinmeyen"
-                    unknown_boxes.append((x1, y1, x2, y2))
-                    continue
-                
-                # Ek confidence filtresi (ürün tipine göre) - Debug için düşük
-                min_confidence = 0.5   # Genel minimum - debug için düşük
-                if "kizil" in product_name.lower():
-                    min_confidence = 0.45  # Kızılay ürünleri için daha düşük
-                elif "dimes" in product_name.lower():
-                    min_confidence = 0.55  # Dimes için biraz daha yüksek
-                
-                if confidence_score < min_confidence:
-                    print(f"❌ Düşük confidence filtrelendi: {product_name} ({confidence_score:.2f} < {min_confidence})")
-                    continue
-                
-                # Ham detection'ı listeye ekle
-                raw_detections.append((x1, y1, x2, y2, product_name, confidence_score))
-
+        boxes = raw_detections.boxes()
+        box_widths = boxes[:, 2] - boxes[:, 0]
+        box_heights = boxes[:, 3] - boxes[:, 1]
+        
+        # Geçersiz kutu kontrolü
+        valid = (box_widths > 0) & (box_heights > 0)
+        
+        # Çok küçük kutuları filtrele (min 30x30 pixel - daha agresif)
+        too_small = valid & ((box_widths < 30) | (box_heights < 30))
+        if too_small.any():
+            print(f"❌ Çok küçük kutu filtrelendi: {int(too_small.sum())} adet")
+        
+        # Çok büyük kutuları da filtrele (muhtemelen hatalı tespit)
+        shelf_height, shelf_width = shelf_image.shape[:2]
+        too_large = valid & ~too_small & (
+            (box_widths > shelf_width * 0.8) | (box_heights > shelf_height * 0.8)
+        )
+        if too_large.any():
+            print(f"❌ Çok büyük kutu filtrelendi: {int(too_large.sum())} adet (raf: {shelf_width}x{shelf_height})")
+        
+        candidates = valid & ~too_small & ~too_large
+        
+        # Bilinmeyen ürün kontrolü
+        class_ids = raw_detections.array["class_id"]
+        unknown = candidates & ((class_ids < 0) | (class_ids >= len(class_table)))
+        unknown_boxes = raw_detections[unknown]
+        unknown_boxes.array["class_id"] = UNKNOWN_CLASS_ID
+        
+        # Ek confidence filtresi (ürün tipine göre)
+        known = candidates & ~unknown
+        min_confidences = _min_confidences(class_table)
+        low_confidence = known.copy()
+        confidences = raw_detections.array["conf"][known].astype(np.float64)
+        low_confidence[known] = confidences < min_confidences[class_ids[known]]
+        if low_confidence.any():
+            print(f"❌ Düşük confidence filtrelendi: {int(low_confidence.sum())} adet")
         
         # Custom NMS uygula
-        filtered_detections = custom_nms(raw_detections, iou_threshold=0.5)
+        filtered_detections = custom_nms(raw_detections[known & ~low_confidence], iou_threshold=0.5)
         
-        # İkinci geçiş: Filtrelenmiş detection'ları işle - EXTRA DUPLICATE KONTROL
-        product_counts = {}
-        total_product_count = 0
-        known_boxes = []
+        # EXTRA KONTROL: aynı pozisyonda (5 pixel tolerans) kutu varsa atla
+        filtered_boxes = filtered_detections.boxes()
+        kept = []
+        for index in range(len(filtered_detections)):
+            if kept and np.any(np.all(np.abs(filtered_boxes[kept] - filtered_boxes[index]) < 5, axis=1)):
+                continue
+            kept.append(index)
+        known_boxes = filtered_detections[np.array(kept, dtype=np.intp)]
         
-
+        # Ürün sayıları
+        product_counts = {
+            product_name: {'count': count}
+            for product_name, count in known_boxes.class_counts().items()
+        }
         
-        for detection in filtered_detections:
-            x1, y1, x2, y2, product_name, confidence_score = detection
-            
-            # EXTRA KONTROL: known_boxes'ta aynı pozisyonda kutu var mı?
-            is_final_duplicate = False
-            for existing_box in known_boxes:
-                ex1, ey1, ex2, ey2, ex_name, ex_conf = existing_box
-                
-                # Koordinat benzerliği kontrolü (5 pixel tolerans)
-                if (abs(x1 - ex1) < 5 and abs(y1 - ey1) < 5 and 
-                    abs(x2 - ex2) < 5 and abs(y2 - ey2) < 5):
-                    is_final_duplicate = True
-
-                    break
-            
-            if not is_final_duplicate:
-                # Ürün sayısını güncelle
-                if product_name not in product_counts:
-                    product_counts[product_name] = {'count': 0}
-                
-                # Altılı paket özel sayımı
-                if "altili" in product_name.lower():
-                    product_counts[product_name]['count'] += 1
-                    total_product_count += 6  # Altılı paket = 6 ürün
-                else:
-                    product_counts[product_name]['count'] += 1
-                    total_product_count += 1
-                
-                # Bilinen kutular listesine ekle
-                known_boxes.append((x1, y1, x2, y2, product_name, confidence_score))
-
+        # Altılı paket özel sayımı (altılı paket = 6 ürün)
+        multipliers = np.where(class_table.flags(lambda name: "altili" in name.lower()), 6, 1)
+        total_product_count = int(multipliers[known_boxes.array["class_id"]].sum()) if len(known_boxes) else 0
         
         return product_counts, total_product_count, unknown_boxes, known_boxes
         
     except Exception as e:
         print(f"Ürün tespit hatası: {e}")
-        return {}, 0, [], []
+        return {}, 0, Detections.empty(class_table), Detections.empty(class_table)
@@ -27,3 +27,69 @@ def create_shelf_mask(image):
     except Exception as e:
         print(f"Raf maskesi oluşturma hatası: {e}")
         return np.zeros(image.shape[:2], dtype=np.uint8)
+
+# Kenar yoğunluğu için en düşük kontrast (gri seviye). Düz bir dilimdeki
+# gürültünün kenar gibi büyütülmesini önler.
+MIN_EDGE_CONTRAST = 32
+
+def edge_density(shelf_image):
+    """
+    Parlaklıktan bağımsız kenar yoğunluğu. Canny eşikleri dilimin kontrastına
+    (1-99. yüzdelik aralığı) göre ölçeklenir; böylece loş ışıkta çekilmiş dolu
+    bir raf, aynı rafın aydınlık halindeki yoğunluğa yakın değer verir.
+    
+    Args:
+        shelf_image: BGR formatında raf görseli
+        
+    Returns:
+        float: Kenar pikseli oranı (0-1)
+    """
+    # Yarı çözünürlükte yeterli
+    gray_image = cv2.cvtColor(shelf_image[::2, ::2], cv2.COLOR_BGR2GRAY)
+    low, high = np.percentile(gray_image, (1, 99))
+    scale = max(float(high - low), MIN_EDGE_CONTRAST) / 255.0
+    edges = cv2.Canny(gray_image, 100 * scale, 200 * scale)
+    return cv2.countNonZero(edges) / float(edges.size)
+
+def classify_shelf(shelf_image, shelf_mask, min_height=30, skip_empty=False, empty_white_ratio=0.9,
+                   empty_edge_density=0.01, empty_white_edge_density=0.02):
+    """
+    Ürün tespitinden önce rafı ucuz istatistiklerle sınıflandırır.
+    Beyaz doluluk tek başına yeterli değildir: beyaz ürünler (ayran, süt)
+    de maskeyi doldurur, bu yüzden beyaz raf ancak kenar yoğunluğu da
+    düşükse boş sayılır. Boş raf kuralları skip_empty ile açılır.
+    
+    Args:
+        shelf_image: BGR formatında raf görseli
+        shelf_mask: Rafa ait create_shelf_mask dilimi
+        min_height: Bu yükseklikten (pixel) ince raflar atlanır
+        skip_empty: Boş raf kurallarını uygula
+        empty_white_ratio: Beyaz doluluk oranı bunu aşan raf beyaz sayılır
+        empty_edge_density: Kenar yoğunluğu bunun altındaysa raf boş sayılır
+        empty_white_edge_density: Beyaz raf, kenar yoğunluğu bunun altındaysa boş sayılır
+        
+    Returns:
+        None (tespit yapılmalı), "ince" veya "bos"
+    """
+    try:
+        # Ürün tespiti min 30 pixel kutu ister; daha ince dilimde ürün çıkamaz
+        if shelf_image.shape[0] < min_height:
+            return "ince"
+        
+        if not skip_empty:
+            return None
+        
+        density = edge_density(shelf_image)
+        if density < empty_edge_density:
+            return "bos"
+        
+        # Beyaz doluluk oranı (raf maskesinden, ek maliyet yok)
+        white_ratio = cv2.countNonZero(shelf_mask) / float(shelf_mask.size)
+        if white_ratio >= empty_white_ratio and density < empty_white_edge_density:
+            return "bos"
+        
+        return None
+        
+    except Exception as e:
+        print(f"Raf ön kontrol hatası: {e}")
+        return None
@@ -0,0 +1,477 @@
+import importlib
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import connection, shared_memory
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+# Süreçler arası görsel aktarımı: çözülmüş yükleme ve analiz sonucu görseli
+# (gorsel) paylaşımlı bellek slotlarında tutulur, worker bağlantılarından yalnızca
+# küçük tanımlayıcılar (FrameDescriptor) geçer. Slotlar geri dönüştürülür, bu sayede
+# yük altında bellek kullanımı sabit kalır.
+
+class FrameDescriptor(NamedTuple):
+    """Paylaşımlı bellekteki bir görselin tanımı"""
+    slot: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+class PoolExhausted(Exception):
+    """Belirtilen sürede boş slot bulunamadı"""
+
+def _frame_view(buffer, descriptor):
+    """
+    Slot belleği üzerinde kopyasız ndarray görünümü oluşturur
+    """
+    return np.ndarray(descriptor.shape, dtype=np.dtype(descriptor.dtype), buffer=buffer)
+
+def _write_frame(buffer, slot, array):
+    """
+    Görseli slot belleğine kopyalar ve tanımlayıcısını döndürür
+    """
+    descriptor = FrameDescriptor(slot, tuple(array.shape), array.dtype.str)
+    np.copyto(_frame_view(buffer, descriptor), array)
+    return descriptor
+
+class SharedFramePool:
+    """
+    Sabit sayıda, sabit boyutlu paylaşımlı bellek slotu havuzu
+    """
+
+    def __init__(self, slot_count, slot_bytes):
+        self.slot_bytes = slot_bytes
+        self._blocks = [
+            shared_memory.SharedMemory(create=True, size=slot_bytes)
+            for _ in range(slot_count)
+        ]
+        self._free = queue.Queue()
+        for slot in range(slot_count):
+            self._free.put(slot)
+
+    @property
+    def names(self):
+        return [block.name for block in self._blocks]
+
+    def acquire(self, timeout=None):
+        """
+        Boş bir slot alır; timeout içinde bulunamazsa PoolExhausted fırlatır
+        """
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolExhausted("Boş paylaşımlı bellek slotu yok")
+
+    def release(self, slot):
+        self._free.put(slot)
+
+    def write(self, slot, array):
+        return _write_frame(self._blocks[slot].buf, slot, array)
+
+    def view(self, descriptor):
+        return _frame_view(self._blocks[descriptor.slot].buf, descriptor)
+
+    def close(self):
+        """
+        Slotları kapatır ve siler (görünümler önceden bırakılmış olmalı)
+        """
+        for block in self._blocks:
+            try:
+                block.close()
+            except BufferError:
+                pass  # Hâlâ görünüm tutan referans var; bellek süreçle birlikte bırakılır
+            block.unlink()
+
+def _worker_main(module_name, slot_names, conn):
+    """
+    Analiz worker süreci: görevi slot üzerinden okur, sonucu aynı slota yazar
+    """
+    analiz_modulu = importlib.import_module(module_name)
+    blocks = [shared_memory.SharedMemory(name=name) for name in slot_names]
+
+    try:
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                break  # Ana süreç bağlantıyı kapattı
+            if task is None:
+                break
+
+            mode, request_id, descriptor, kwargs = task
+            image = None
+            try:
+                block = blocks[descriptor.slot]
+                image = _frame_view(block.buf, descriptor)
+                if mode == "akis":
+                    # Ara olaylar küçük sözlüklerdir, doğrudan bağlantıdan geçer
+                    sonuc = {"error": "Raf analizi hatası: sonuç üretilemedi"}
+                    for olay, veri in analiz_modulu.raf_analizi_akisi(image, **kwargs):
+                        if olay == "sonuc":
+                            sonuc = veri
+                            break
+                        conn.send((request_id, "olay", (olay, veri)))
+                else:
+                    sonuc = analiz_modulu.raf_analizi_yap(image, **kwargs)
+
+                # Giriş görseli artık gerekmiyor: sonuç görselini aynı slota yaz
+                gorsel = sonuc.get("gorsel") if isinstance(sonuc, dict) else None
+                if gorsel is not None and gorsel.nbytes <= block.size:
+                    image = None
+                    sonuc["gorsel"] = _write_frame(block.buf, descriptor.slot, gorsel)
+
+                conn.send((request_id, "sonuc", sonuc))
+            except Exception as e:
+                print(f"❌ Analiz worker hatası: {e}")
+                conn.send((request_id, "sonuc", {"error": f"Raf analizi hatası: {str(e)}"}))
+            finally:
+                image = None
+    finally:
+        for block in blocks:
+            block.close()
+
+class WorkerDied(RuntimeError):
+    """Analiz worker süreci istek tamamlanmadan sonlandı"""
+
+class _Worker:
+    """Worker süreci, ona ait bağlantı ve üzerinde çalışan istekler"""
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.requests = set()
+        self.dead = False
+
+class _Request:
+    """Bekleyen bir analiz isteği"""
+
+    def __init__(self, slot):
+        self.slot = slot
+        self.worker = None
+        # ("olay", (olay, veri)), ("sonuc", sonuc) veya ("hata", istisna)
+        self.messages = queue.Queue()
+        # İsteyen taraf vazgeçti; slot sonuç gelince dispatcher tarafından bırakılır
+        self.abandoned = False
+
+class AnalysisStream:
+    """
+    Worker'da çalışan raf_analizi_akisi olaylarını okuyan akış. Son olay
+    ("sonuc", sonuc) olup "gorsel" slot üzerinde kopyasız bir görünümdür
+    ve yalnızca bir sonraki olay istenene kadar geçerlidir.
+    """
+
+    def __init__(self, pool, request_id, request, deadline):
+        self._pool = pool
+        self._request_id = request_id
+        self._request = request
+        self._deadline = deadline
+        self._closed = False
+
+    def __iter__(self):
+        sonuc = None
+        try:
+            while True:
+                kind, payload = self._pool._receive(self._request, self._deadline)
+                if kind == "olay":
+                    yield payload
+                    continue
+                sonuc = self._pool._attach_frame(payload)
+                yield "sonuc", sonuc
+                return
+        finally:
+            if isinstance(sonuc, dict):
+                sonuc.pop("gorsel", None)
+            self.close()
+
+    def close(self):
+        """Slotu bırakır (worker hâlâ çalışıyorsa sonuç gelince bırakılır)"""
+        if not self._closed:
+            self._closed = True
+            self._pool._finish(self._request_id, self._request)
+
+    def __del__(self):
+        self.close()
+
+class AnalysisWorkerPool:
+    """
+    raf_analizi_yap çağrılarını ayrı süreçlerde, paylaşımlı bellek
+    üzerinden çalıştıran worker havuzu. Sonlanan worker'ın bekleyen
+    istekleri WorkerDied ile sonuçlanır, slotları geri alınır ve
+    worker yeniden başlatılır. Zaman aşımına uğrayan isteğin worker'ı
+    sonlandırılır, böylece takılan worker da aynı yoldan geri kazanılır.
+    """
+
+    def __init__(self, module_name, worker_count, slot_count, slot_bytes):
+        self._ctx = mp.get_context("spawn")
+        self._module_name = module_name
+        self.frames = SharedFramePool(slot_count, slot_bytes)
+        self._requests = {}
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._closing = threading.Event()
+
+        self._workers = [self._spawn() for _ in range(worker_count)]
+
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def _spawn(self):
+        """
+        Yeni bir worker süreci başlatır
+        """
+        conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self._module_name, self.frames.names, child_conn),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process, conn)
+
+    def fits(self, image):
+        """Görsel bir slota sığıyor mu"""
+        return image.nbytes <= self.frames.slot_bytes
+
+    def _dispatch(self):
+        """
+        Worker bağlantılarını ve süreç çıkışlarını dinler; olayları ve sonuçları
+        ilgili isteğe iletir, sonlanan worker'ları temizleyip yeniden başlatır
+        """
+        while not self._closing.is_set():
+            with self._lock:
+                workers = list(self._workers)
+
+            waitables = {}
+            for worker in workers:
+                waitables[worker.conn] = worker
+                waitables[worker.process.sentinel] = worker
+
+            for ready in connection.wait(list(waitables), timeout=0.5):
+                worker = waitables[ready]
+                if worker.dead:
+                    continue
+                try:
+                    # Çıkmış olsa bile göndermiş olduğu sonuçları önce teslim et
+                    while worker.conn.poll():
+                        self._deliver(worker, *worker.conn.recv())
+                except (EOFError, OSError):
+                    self._worker_died(worker)
+                    continue
+                if ready is worker.process.sentinel:
+                    self._worker_died(worker)
+
+    def _deliver(self, worker, request_id, kind, payload):
+        """
+        Olayı / sonucu bekleyen isteğe iletir; istek terk edilmişse sonuçla birlikte slotu bırakır
+        """
+        with self._lock:
+            request = self._requests.get(request_id)
+            if request is None:
+                return
+            if kind == "sonuc":
+                worker.requests.discard(request_id)
+                del self._requests[request_id]
+            if not request.abandoned:
+                request.messages.put((kind, payload))
+                return
+        # Terk edilmiş istek: slot ancak worker bitince serbest kalır
+        if kind == "sonuc":
+            self.frames.release(request.slot)
+
+    def _worker_died(self, worker):
+        """
+        Sonlanan worker'ın isteklerini hata ile sonuçlandırır ve yerine yenisini başlatır
+        """
+        worker.process.join(timeout=1)
+        exitcode = worker.process.exitcode
+
+        with self._lock:
+            worker.dead = True
+            orphans = [
+                self._requests.pop(request_id)
+                for request_id in worker.requests
+                if request_id in self._requests
+            ]
+            worker.requests.clear()
+            self._workers.remove(worker)
+        worker.conn.close()
+
+        for request in orphans:
+            if request.abandoned:
+                self.frames.release(request.slot)
+            else:
+                request.messages.put(
+                    ("hata", WorkerDied(f"Analiz worker'ı sonlandı (çıkış kodu {exitcode})"))
+                )
+
+        if self._closing.is_set():
+            return
+
+        print(f"❌ Analiz worker'ı sonlandı (çıkış kodu {exitcode}), yeniden başlatılıyor")
+        replacement = self._spawn()
+        with self._lock:
+            self._workers.append(replacement)
+
+    def _submit(self, mode, request_id, request, descriptor, kwargs):
+        """
+        İsteği en az yüklü canlı worker'a gönderir
+        """
+        with self._lock:
+            workers = [worker for worker in self._workers if not worker.dead]
+            if not workers:
+                raise WorkerDied("Çalışan analiz worker'ı yok")
+            worker = min(workers, key=lambda w: len(w.requests))
+            try:
+                worker.conn.send((mode, request_id, descriptor, kwargs))
+            except OSError:
+                raise WorkerDied("Analiz worker'ına görev gönderilemedi")
+            worker.requests.add(request_id)
+            request.worker = worker
+            self._requests[request_id] = request
+
+    def _start(self, mode, image, acquire_timeout, kwargs):
+        """
+        Slot alır, görseli yazar ve isteği bir worker'a gönderir
+
+        Returns:
+            tuple: (istek_id, istek)
+        """
+        slot = self.frames.acquire(timeout=acquire_timeout)
+        request = _Request(slot)
+        request_id = next(self._request_ids)
+        try:
+            descriptor = self.frames.write(slot, image)
+            self._submit(mode, request_id, request, descriptor, kwargs)
+        except BaseException:
+            self.frames.release(slot)
+            raise
+        return request_id, request
+
+    def _receive(self, request, deadline):
+        """
+        İsteğin bir sonraki mesajını bekler. Süre dolarsa isteği çalıştıran
+        worker sonlandırılır: takılan worker slotu sonsuza dek tutmaz, slotlar
+        _worker_died üzerinden geri alınır ve worker yeniden başlatılır.
+
+        Raises:
+            TimeoutError: Süre doldu
+            WorkerDied: Worker istek sırasında sonlandı
+        """
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            kind, payload = request.messages.get(timeout=remaining)
+        except queue.Empty:
+            self._terminate_owner(request)
+            raise TimeoutError("Analiz zaman aşımına uğradı")
+        if kind == "hata":
+            raise payload
+        return kind, payload
+
+    def _terminate_owner(self, request):
+        """
+        Zaman aşımına uğrayan isteğin worker'ını sonlandırır
+        """
+        with self._lock:
+            worker = request.worker
+            if worker is None or worker.dead:
+                return
+        print(f"⏱️ Analiz zaman aşımı, worker sonlandırılıyor (pid {worker.process.pid})")
+        worker.process.terminate()
+
+    def _attach_frame(self, sonuc):
+        """Sonuçtaki gorsel tanımlayıcısını slot görünümüne çevirir"""
+        if isinstance(sonuc, dict) and isinstance(sonuc.get("gorsel"), FrameDescriptor):
+            sonuc["gorsel"] = self.frames.view(sonuc["gorsel"])
+        return sonuc
+
+    def _finish(self, request_id, request):
+        """
+        İstek bitti veya terk edildi: worker slotu hâlâ kullanıyorsa
+        dispatcher'a bırakır, aksi halde slotu hemen geri verir
+        """
+        with self._lock:
+            if request_id in self._requests:
+                request.abandoned = True
+                return
+        self.frames.release(request.slot)
+
+    @contextmanager
+    def analyze(self, image, acquire_timeout=None, timeout=None, **kwargs):
+        """
+        Görseli bir slota yazar ve analizi bir worker'da çalıştırır
+
+        Args:
+            image: RGB formatında görsel
+            acquire_timeout: Boş slot bekleme süresi (saniye)
+            timeout: Analiz bekleme süresi (saniye)
+            **kwargs: raf_analizi_yap parametreleri
+
+        Yields:
+            Dict: Analiz sonuçları. "gorsel" slot üzerinde kopyasız bir
+            görünümdür ve yalnızca with bloğu içinde geçerlidir.
+
+        Raises:
+            PoolExhausted: acquire_timeout içinde boş slot yok
+            WorkerDied: Worker analiz sırasında sonlandı
+        """
+        request_id, request = self._start("yap", image, acquire_timeout, kwargs)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        sonuc = None
+
+        try:
+            kind, sonuc = self._receive(request, deadline)
+            sonuc = self._attach_frame(sonuc)
+            yield sonuc
+        finally:
+            # Görünümü bırak; slot bir sonraki isteğe geçecek
+            if isinstance(sonuc, dict):
+                sonuc.pop("gorsel", None)
+            self._finish(request_id, request)
+
+    def analyze_stream(self, image, acquire_timeout=None, timeout=None, **kwargs):
+        """
+        analyze ile aynı, ancak raf_analizi_akisi olaylarını worker'dan
+        geldikçe döndürür. Slot hemen alınır: havuz doluysa PoolExhausted
+        akış başlamadan fırlatılır.
+
+        Returns:
+            AnalysisStream: (olay, veri) çiftleri; son çift ("sonuc", sonuc)
+        """
+        request_id, request = self._start("akis", image, acquire_timeout, kwargs)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        return AnalysisStream(self, request_id, request, deadline)
+
+    def close(self):
+        """
+        Worker'ları durdurur ve paylaşımlı belleği serbest bırakır
+        """
+        self._closing.set()
+        with self._lock:
+            workers = list(self._workers)
+            for worker in workers:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass  # Worker zaten sonlanmış
+        for worker in workers:
+            worker.process.join(timeout=10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+        self._dispatcher.join(timeout=10)
+
+        # Hâlâ bekleyen istekleri sonuçlandır
+        with self._lock:
+            orphans = list(self._requests.values())
+            self._requests.clear()
+        for request in orphans:
+            if not request.abandoned:
+                request.messages.put(("hata", WorkerDied("Analiz havuzu kapatıldı")))
+        for worker in workers:
+            worker.conn.close()
+        self.frames.close()
@@ -0,0 +1,31 @@
+"""
+shm_transport testleri için sahte analiz modülü. Davranış görselin ilk
+pikselinden seçilir, böylece worker süreci ek bir kanal gerektirmez.
+"""
+import os
+import time
+
+# Görselin [0, 0, 0] pikseli için davranışlar
+CRASH = 255  # Worker istek sırasında sonlanır
+HANG = 128   # Worker takılır (zaman aşımı)
+SLOW = 64    # Analiz biraz sürer (eşzamanlı istekler için)
+
+def _behave(image):
+    marker = int(image[0, 0, 0])
+    if marker == CRASH:
+        os._exit(7)
+    if marker == HANG:
+        time.sleep(60)
+    if marker == SLOW:
+        time.sleep(0.3)
+
+def raf_analizi_yap(image, **kwargs):
+    _behave(image)
+    return {"toplam_urun": 1, "pid": os.getpid(), "gorsel": image.copy()}
+
+def raf_analizi_akisi(image, **kwargs):
+    yield "buzdolabi", {"pid": os.getpid()}
+    _behave(image)
+    for raf_no in range(1, 3):
+        yield "raf", {"raf_no": raf_no}
+    yield "sonuc", {"toplam_urun": 2, "gorsel": image.copy()}
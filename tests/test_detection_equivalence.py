@@ -0,0 +1,281 @@
+"""
+Dizi tabanlı tespit hattının (Detections) eski liste tabanlı uygulamayla
+aynı sonucu verdiğini doğrular. Referans fonksiyonlar değişiklik öncesi
+product_detector.py'den alınmıştır (yalnızca log satırları çıkarıldı).
+
+Çalıştırma:
+    python -m pytest tests
+"""
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("ultralytics")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import product_detector
+from detections import ClassTable, Detections
+
+MODEL_NAMES = {
+    0: "kizilay_sade",
+    1: "kizil_limon",
+    2: "dimes_kayisi",
+    3: "uludag_gazoz",
+    4: "cola_altili",
+}
+
+# Eşiklerin tam üstü/altı: YOLO confidence'ı float32 olarak üretir
+EDGE_CONFIDENCES = [
+    float(np.nextafter(np.float32(value), direction))
+    for value in (0.45, 0.5, 0.55)
+    for direction in (np.float32(0), np.float32(1))
+] + [float(np.float32(value)) for value in (0.45, 0.5, 0.55)]
+
+def _reference_iou(box1, box2):
+    x1_1, y1_1, x2_1, y2_1 = box1
+    x1_2, y1_2, x2_2, y2_2 = box2
+
+    x1_intersect = max(x1_1, x1_2)
+    y1_intersect = max(y1_1, y1_2)
+    x2_intersect = min(x2_1, x2_2)
+    y2_intersect = min(y2_1, y2_2)
+
+    if x2_intersect <= x1_intersect or y2_intersect <= y1_intersect:
+        return 0.0
+
+    intersection_area = (x2_intersect - x1_intersect) * (y2_intersect - y1_intersect)
+    area1 = (x2_1 - x1_1) * (y2_1 - y1_1)
+    area2 = (x2_2 - x1_2) * (y2_2 - y1_2)
+    union_area = area1 + area2 - intersection_area
+    if union_area == 0:
+        return 0.0
+    return intersection_area / union_area
+
+def _is_kizilay_duplicate(class1, class2):
+    return "kizil" in class1.lower() and "kizil" in class2.lower()
+
+def _reference_nms(detections, iou_threshold=0.2, cross_class_iou_threshold=0.3):
+    if not detections:
+        return []
+
+    detections = sorted(detections, key=lambda x: x[5], reverse=True)
+    filtered_detections = []
+
+    while detections:
+        current_detection = detections.pop(0)
+        current_class = current_detection[4]
+        current_box = current_detection[:4]
+        current_confidence = current_detection[5]
+
+        should_keep = True
+        for accepted_detection in filtered_detections:
+            accepted_class = accepted_detection[4]
+            iou = _reference_iou(current_box, accepted_detection[:4])
+
+            if accepted_class == current_class:
+                if iou > iou_threshold:
+                    should_keep = False
+                    break
+            else:
+                effective_threshold = cross_class_iou_threshold
+                if _is_kizilay_duplicate(current_class, accepted_class):
+                    effective_threshold = 0.15
+                if iou > effective_threshold:
+                    if current_confidence <= accepted_detection[5]:
+                        should_keep = False
+                        break
+                    filtered_detections.remove(accepted_detection)
+
+        if should_keep:
+            filtered_detections.append(current_detection)
+
+        remaining_detections = []
+        for detection in detections:
+            detection_class = detection[4]
+            iou = _reference_iou(current_box, detection[:4])
+
+            if detection_class == current_class and should_keep:
+                if iou < iou_threshold:
+                    remaining_detections.append(detection)
+            elif detection_class != current_class:
+                effective_threshold = cross_class_iou_threshold
+                if _is_kizilay_duplicate(current_class, detection_class):
+                    effective_threshold = 0.15
+                if should_keep and iou > effective_threshold:
+                    if detection[5] > current_confidence:
+                        remaining_detections.append(detection)
+                else:
+                    remaining_detections.append(detection)
+            else:
+                remaining_detections.append(detection)
+
+        detections = remaining_detections
+
+    return filtered_detections
+
+def _reference_process(result, shelf_image):
+    """Eski detect_products_in_shelf'in model çağrısından sonraki kısmı"""
+    all_classes = list(result.names.values())
+    raw_detections = []
+    unknown_boxes = []
+
+    for box in result.boxes:
+        class_id = int(box.cls[0])
+        product_name = result.names.get(class_id, "bilinmeyen")
+        confidence_score = float(box.conf[0])
+        x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
+
+        if x2 <= x1 or y2 <= y1:
+            continue
+        box_width = x2 - x1
+        box_height = y2 - y1
+        if box_width < 30 or box_height < 30:
+            continue
+        shelf_height, shelf_width = shelf_image.shape[:2]
+        if (box_width > shelf_width * 0.8) or (box_height > shelf_height * 0.8):
+            continue
+        if product_name not in all_classes:
+            unknown_boxes.append((x1, y1, x2, y2))
+            continue
+
+        min_confidence = 0.5
+        if "kizil" in product_name.lower():
+            min_confidence = 0.45
+        elif "dimes" in product_name.lower():
+            min_confidence = 0.55
+        if confidence_score < min_confidence:
+            continue
+
+        raw_detections.append((x1, y1, x2, y2, product_name, confidence_score))
+
+    filtered_detections = _reference_nms(raw_detections, iou_threshold=0.5)
+
+    product_counts = {}
+    total_product_count = 0
+    known_boxes = []
+    for detection in filtered_detections:
+        x1, y1, x2, y2, product_name, confidence_score = detection
+        if any(
+            abs(x1 - ex1) < 5 and abs(y1 - ey1) < 5 and abs(x2 - ex2) < 5 and abs(y2 - ey2) < 5
+            for ex1, ey1, ex2, ey2, _, _ in known_boxes
+        ):
+            continue
+        product_counts.setdefault(product_name, {'count': 0})['count'] += 1
+        total_product_count += 6 if "altili" in product_name.lower() else 1
+        known_boxes.append(detection)
+
+    return product_counts, total_product_count, unknown_boxes, known_boxes
+
+class _Tensor:
+    """torch.Tensor yerine geçen küçük sarmalayıcı (cpu/numpy/indeksleme)"""
+
+    def __init__(self, array):
+        self.array = np.asarray(array)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+    def tolist(self):
+        return self.array.tolist()
+
+    def __getitem__(self, index):
+        item = self.array[index]
+        return _Tensor(item) if np.ndim(item) else item
+
+class _Box:
+    def __init__(self, xyxy, cls, conf):
+        self.xyxy = _Tensor([xyxy])
+        self.cls = _Tensor([cls])
+        self.conf = _Tensor([conf])
+
+class _Boxes(list):
+    @property
+    def xyxy(self):
+        return _Tensor(np.array([box.xyxy.array[0] for box in self], dtype=np.float32).reshape(-1, 4))
+
+    @property
+    def cls(self):
+        return _Tensor(np.array([box.cls.array[0] for box in self], dtype=np.float32))
+
+    @property
+    def conf(self):
+        return _Tensor(np.array([box.conf.array[0] for box in self], dtype=np.float32))
+
+class _Result:
+    def __init__(self, boxes, names):
+        self.boxes = boxes
+        self.names = names
+
+def _random_confidence(rng):
+    if rng.random() < 0.3:
+        return rng.choice(EDGE_CONFIDENCES)
+    # Eşitlik durumlarını da üretmek için iki basamağa yuvarla
+    return float(np.float32(round(rng.uniform(0.4, 1.0), 2)))
+
+def _random_result(rng, width, height):
+    boxes = _Boxes()
+    for _ in range(rng.randint(0, 30)):
+        x1 = rng.uniform(-5, width * 0.8)
+        y1 = rng.uniform(-5, height * 0.7)
+        xyxy = [x1, y1, x1 + rng.uniform(-5, width * 0.7), y1 + rng.uniform(-5, height * 0.9)]
+        # 5 sınıf + modelde olmayan bir id
+        boxes.append(_Box(np.float32(xyxy), float(rng.randint(0, 5)), np.float32(_random_confidence(rng))))
+    return _Result(boxes, MODEL_NAMES)
+
+def _as_tuples(detections):
+    return [
+        (x1, y1, x2, y2, detections.classes.name_of(class_id), conf)
+        for x1, y1, x2, y2, class_id, conf in detections.array.tolist()
+    ]
+
+def test_custom_nms_matches_reference():
+    rng = random.Random(0)
+    table = ClassTable.from_model_names(MODEL_NAMES)
+    names = list(MODEL_NAMES.values())
+
+    for _ in range(500):
+        reference_input = []
+        for _ in range(rng.randint(0, 25)):
+            x1, y1 = rng.randint(0, 300), rng.randint(0, 300)
+            reference_input.append((
+                x1, y1, x1 + rng.randint(30, 120), y1 + rng.randint(30, 120),
+                rng.choice(names), _random_confidence(rng)
+            ))
+
+        detections = Detections.from_arrays(
+            np.array([d[:4] for d in reference_input], dtype=np.int32).reshape(-1, 4),
+            np.array([table.id_of(d[4]) for d in reference_input], dtype=np.int16),
+            np.array([d[5] for d in reference_input], dtype=np.float32),
+            table
+        )
+
+        expected = _reference_nms(list(reference_input), iou_threshold=0.5)
+        actual = product_detector.custom_nms(detections, iou_threshold=0.5)
+        assert _as_tuples(actual) == expected
+
+def test_process_detection_result_matches_reference():
+    rng = random.Random(1)
+    table = product_detector._class_table_for(MODEL_NAMES)
+    shelf_image = np.zeros((300, 500, 3), dtype=np.uint8)
+
+    for _ in range(300):
+        result = _random_result(rng, shelf_image.shape[1], shelf_image.shape[0])
+
+        expected_counts, expected_total, expected_unknown, expected_known = _reference_process(result, shelf_image)
+        counts, total, unknown_boxes, known_boxes = product_detector._process_detection_result(
+            result, shelf_image, table
+        )
+
+        assert counts == expected_counts
+        assert list(counts) == list(expected_counts)
+        assert total == expected_total
+        assert [tuple(box) for box in unknown_boxes.boxes().tolist()] == expected_unknown
+        assert _as_tuples(known_boxes) == expected_known
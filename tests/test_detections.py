@@ -0,0 +1,50 @@
+"""
+Detections alt küme semantiği ve pairwise_iou.
+
+Çalıştırma:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detections import ClassTable, Detections, UNKNOWN_CLASS_ID, pairwise_iou
+
+def _detections():
+    table = ClassTable.from_model_names({0: "kola", 1: "ayran"})
+    return Detections.from_arrays(
+        np.array([[0, 0, 10, 10], [5, 5, 15, 15], [20, 20, 30, 30]], dtype=np.int32),
+        np.array([0, 1, 0], dtype=np.int16),
+        np.array([0.9, 0.8, 0.7], dtype=np.float32),
+        table
+    )
+
+@pytest.mark.parametrize("index", [
+    np.array([True, False, True]),
+    np.array([2, 0]),
+    slice(0, 2),
+    1,
+])
+def test_getitem_returns_copy(index):
+    detections = _detections()
+    original = detections.array.copy()
+
+    subset = detections[index]
+    subset.array["class_id"] = UNKNOWN_CLASS_ID
+
+    assert subset.array.ndim == 1
+    assert subset.classes is detections.classes
+    np.testing.assert_array_equal(detections.array, original)
+
+def test_pairwise_iou():
+    ious = pairwise_iou(_detections().boxes())
+
+    assert ious.shape == (3, 3)
+    np.testing.assert_allclose(np.diag(ious), 1.0)
+    np.testing.assert_allclose(ious, ious.T)
+    assert ious[0, 1] == pytest.approx(25 / 175)
+    assert ious[0, 2] == 0.0
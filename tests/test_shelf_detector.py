@@ -0,0 +1,73 @@
+"""
+classify_shelf ön kontrol kuralları: ince dilim, boş dilim, beyaz ürünlü
+raf ve loş ışıkta çekilmiş dolu raf. Dolu raf örnekleri examples/
+altındaki görsellerden kesilir.
+
+Çalıştırma:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from shelf_detector import classify_shelf, create_shelf_mask, edge_density
+
+# Dolu raf dilimleri: (görsel, başlangıç satırı, bitiş satırı)
+STOCKED_SHELVES = [
+    ("dolap_710.png", 637, 850),
+    ("dolap_710.png", 425, 637),
+    ("cokludolap5.jpeg", 0, 400),
+    ("cokludolap1.jpeg", 246, 517),
+]
+
+def _stocked_shelf(name, start, end):
+    image = cv2.imread(os.path.join(REPO_DIR, "examples", name))
+    if image is None:
+        pytest.skip(f"Örnek görsel yok: {name}")
+    return image[start:end]
+
+def _classify(shelf_image, **kwargs):
+    return classify_shelf(shelf_image, create_shelf_mask(shelf_image), skip_empty=True, **kwargs)
+
+def test_thin_slice_skipped():
+    thin = np.full((20, 600, 3), 90, dtype=np.uint8)
+    assert classify_shelf(thin, create_shelf_mask(thin)) == "ince"
+
+def test_empty_rules_off_by_default():
+    blank = np.full((200, 600, 3), 240, dtype=np.uint8)
+    assert classify_shelf(blank, create_shelf_mask(blank)) is None
+
+@pytest.mark.parametrize("level", [40, 120, 240])
+def test_blank_slice_is_empty(level):
+    rng = np.random.default_rng(level)
+    # Sensör gürültüsü kenar sayılmamalı
+    blank = np.clip(level + rng.normal(0, 2, (200, 600, 3)), 0, 255).astype(np.uint8)
+    assert _classify(blank) == "bos"
+
+@pytest.mark.parametrize("name,start,end", STOCKED_SHELVES)
+def test_white_product_shelf_is_not_empty(name, start, end):
+    # Dolu rafı beyaza yaklaştır: beyaz maske dolar, ürün kenarları kalır
+    gray = cv2.cvtColor(_stocked_shelf(name, start, end), cv2.COLOR_BGR2GRAY).astype(np.float32)
+    white = np.clip(255 - (255 - gray) * 0.2, 0, 255).astype(np.uint8)
+    white = cv2.cvtColor(white, cv2.COLOR_GRAY2BGR)
+
+    mask = create_shelf_mask(white)
+    assert cv2.countNonZero(mask) / mask.size >= 0.9
+    assert _classify(white) is None
+
+@pytest.mark.parametrize("name,start,end", STOCKED_SHELVES)
+@pytest.mark.parametrize("brightness", [0.35, 0.2])
+def test_dim_stocked_shelf_is_not_empty(name, start, end, brightness):
+    shelf = _stocked_shelf(name, start, end)
+    dim = (shelf.astype(np.float32) * brightness).astype(np.uint8)
+
+    assert _classify(dim) is None
+    # Kenar yoğunluğu parlaklıkla birlikte çökmemeli
+    assert edge_density(dim) > 0.5 * edge_density(shelf)
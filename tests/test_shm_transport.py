@@ -0,0 +1,123 @@
+"""
+AnalysisWorkerPool davranışları: slot geri dönüşümü, sonlanan/takılan
+worker'ın geri kazanılması ve terk edilen akışın slotu bırakması.
+Worker'lar tests/fake_analysis.py modülünü çalıştırır.
+
+Çalıştırma:
+    python -m pytest tests
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+# spawn ile başlayan worker'lar sys.path'i devralır
+sys.path.insert(0, TESTS_DIR)
+
+import fake_analysis
+from shm_transport import AnalysisWorkerPool, PoolExhausted, WorkerDied
+
+SLOT_COUNT = 2
+
+def _image(marker=0):
+    image = np.zeros((16, 16, 3), dtype=np.uint8)
+    image[0, 0, 0] = marker
+    return image
+
+def _free_slots(pool):
+    return pool.frames._free.qsize()
+
+def _wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+def _live_workers(pool):
+    return [worker for worker in pool._workers if not worker.dead and worker.process.is_alive()]
+
+@pytest.fixture
+def pool():
+    pool = AnalysisWorkerPool("fake_analysis", 1, slot_count=SLOT_COUNT, slot_bytes=1 << 16)
+    yield pool
+    pool.close()
+
+def _analyze(pool, marker, acquire_timeout):
+    with pool.analyze(_image(marker), acquire_timeout=acquire_timeout, timeout=30) as sonuc:
+        assert sonuc["gorsel"][0, 0, 0] == marker
+        return sonuc["toplam_urun"]
+
+def test_slots_recycled_and_excess_requests_rejected(pool):
+    # Slot sayısından fazla eşzamanlı istek: fazlası PoolExhausted alır
+    with ThreadPoolExecutor(SLOT_COUNT * 3) as executor:
+        futures = [
+            executor.submit(_analyze, pool, fake_analysis.SLOW, 0.05)
+            for _ in range(SLOT_COUNT * 3)
+        ]
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result())
+            except PoolExhausted:
+                outcomes.append("dolu")
+
+    assert outcomes.count(1) >= SLOT_COUNT
+    assert "dolu" in outcomes
+    assert _free_slots(pool) == SLOT_COUNT
+
+    # Slotlar geri dönüştürülür: sırayla slot sayısından çok istek
+    for _ in range(SLOT_COUNT * 4):
+        assert _analyze(pool, 0, acquire_timeout=1) == 1
+    assert _free_slots(pool) == SLOT_COUNT
+
+def test_worker_exit_mid_request(pool):
+    old_pid = pool._workers[0].process.pid
+
+    with pytest.raises(WorkerDied):
+        with pool.analyze(_image(fake_analysis.CRASH), acquire_timeout=1, timeout=30):
+            pass
+
+    # Slot serbest listesine döner, worker yeniden başlatılır
+    assert _free_slots(pool) == SLOT_COUNT
+    assert _wait_until(lambda: len(_live_workers(pool)) == 1)
+    assert pool._workers[0].process.pid != old_pid
+
+    with pool.analyze(_image(), acquire_timeout=1, timeout=30) as sonuc:
+        assert sonuc["pid"] != old_pid
+
+def test_timeout_terminates_hung_worker(pool):
+    old_pid = pool._workers[0].process.pid
+
+    with pytest.raises(TimeoutError):
+        with pool.analyze(_image(fake_analysis.HANG), acquire_timeout=1, timeout=0.5):
+            pass
+
+    # Takılan worker sonlandırılır; slotu geri alınır ve worker yenilenir
+    assert _wait_until(lambda: _free_slots(pool) == SLOT_COUNT)
+    assert _wait_until(lambda: len(_live_workers(pool)) == 1 and pool._workers[0].process.pid != old_pid)
+    assert _analyze(pool, 0, acquire_timeout=1) == 1
+
+def test_stream_events_in_order(pool):
+    stream = pool.analyze_stream(_image(), acquire_timeout=1, timeout=30)
+    events = [olay for olay, _ in stream]
+
+    assert events == ["buzdolabi", "raf", "raf", "sonuc"]
+    assert _free_slots(pool) == SLOT_COUNT
+
+def test_abandoned_stream_releases_slot(pool):
+    stream = pool.analyze_stream(_image(fake_analysis.SLOW), acquire_timeout=1, timeout=30)
+    events = iter(stream)
+    assert next(events)[0] == "buzdolabi"
+
+    # İstemci akışı yarıda bıraktı; worker bitirince slot bırakılır
+    events.close()
+    del events, stream
+    assert _wait_until(lambda: _free_slots(pool) == SLOT_COUNT)
+    assert not pool._requests
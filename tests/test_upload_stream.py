@@ -0,0 +1,150 @@
+"""
+/upload/stream uç noktası: olay sırası, tamamlandi yükü ve havuzun
+429/503 yolları. Model katmanı stub_backend ile taklit edilir; analiz
+hem süreç içinde hem tek worker'lı havuzda çalıştırılır.
+
+Çalıştırma:
+    python -m pytest tests
+"""
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("ultralytics")
+pytest.importorskip("httpx")  # TestClient
+
+from fastapi.testclient import TestClient
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from shm_transport import WorkerDied
+
+IMAGE_PATH = os.path.join(REPO_DIR, "examples", "dolap_710.png")
+
+@pytest.fixture(scope="module")
+def web_app():
+    static_dir = tempfile.mkdtemp(prefix="test_static_")
+    with pytest.MonkeyPatch.context() as patch:
+        # web_app analiz modülünü ve static dizini import sırasında okur
+        patch.setenv("ANALIZ_MODULE", "stub_backend")
+        patch.setenv("STUB_LATENCY_MS", "0")
+        patch.setenv("STATIC_DIR", static_dir)
+        patch.chdir(REPO_DIR)
+        sys.modules.pop("web_app", None)
+        yield importlib.import_module("web_app")
+        sys.modules.pop("web_app", None)
+    shutil.rmtree(static_dir, ignore_errors=True)
+
+@contextmanager
+def _running_app(web_app, monkeypatch, havuz):
+    monkeypatch.setitem(web_app.INFERENCE_SETTINGS, "analysis_pool", havuz)
+    monkeypatch.setitem(web_app.INFERENCE_SETTINGS, "workers", 1)
+    # with bloğu startup/shutdown olaylarını çalıştırır (havuz açılır/kapanır)
+    with TestClient(web_app.app) as client:
+        assert (web_app.analysis_pool is not None) == havuz
+        yield client
+
+@pytest.fixture(params=["surec_ici", "havuz"])
+def client(request, web_app, monkeypatch):
+    with _running_app(web_app, monkeypatch, request.param == "havuz") as client:
+        yield client
+
+@pytest.fixture
+def pool_client(web_app, monkeypatch):
+    with _running_app(web_app, monkeypatch, True) as client:
+        yield client
+
+def _post(client):
+    with open(IMAGE_PATH, "rb") as image_file:
+        return client.post(
+            "/upload/stream",
+            files={"file": ("dolap.png", image_file, "image/png")},
+        )
+
+def _events(response):
+    events = []
+    for block in response.text.split("\n\n"):
+        if not block.strip():
+            continue
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_stream_event_order_and_result(client, web_app):
+    response = _post(client)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _events(response)
+    names = [name for name, _ in events]
+    raf_sinirlari = events[1][1]
+
+    # buzdolabi -> raf_sinirlari -> raf x N -> tamamlandi
+    assert names[:2] == ["buzdolabi", "raf_sinirlari"]
+    assert names[2:-1] == ["raf"] * raf_sinirlari["raf_sayisi"]
+    assert names[-1] == "tamamlandi"
+    assert raf_sinirlari["raf_sayisi"] > 0
+    assert [veri["raf_no"] for name, veri in events if name == "raf"] == list(
+        range(1, raf_sinirlari["raf_sayisi"] + 1)
+    )
+
+    tamamlandi = events[-1][1]
+    assert tamamlandi["raf_sayisi"] == raf_sinirlari["raf_sayisi"]
+    assert tamamlandi["atlanan_raf"] == raf_sinirlari["atlanan_raf"]
+    assert os.path.exists(os.path.join(web_app.STATIC_DIR, os.path.basename(tamamlandi["image_url"])))
+
+    # Tespitler toplamla tutarlı olmalı (altılı paket = 6 ürün)
+    tespitler = tamamlandi["tespitler"]
+    assert len(tespitler["boxes"]) == len(tespitler["class_ids"]) == len(tespitler["conf"]) > 0
+    assert all(len(box) == 4 for box in tespitler["boxes"])
+    assert tamamlandi["toplam_urun"] == sum(
+        6 if "altili" in tespitler["classes"][class_id] else 1
+        for class_id in tespitler["class_ids"]
+    )
+    raf_urunleri = sum(sum(veri["urunler"].values()) for name, veri in events if name == "raf")
+    assert raf_urunleri == len(tespitler["class_ids"])
+
+def test_stream_rejected_when_pool_full(pool_client, web_app, monkeypatch):
+    monkeypatch.setattr(web_app, "SLOT_WAIT_S", 0.1)
+    pool = web_app.analysis_pool
+    image = web_app._gorseli_coz(open(IMAGE_PATH, "rb").read())
+
+    # Tüm slotları tut
+    slot_count = pool.frames._free.qsize()
+    held = [pool.analyze_stream(image, acquire_timeout=1) for _ in range(slot_count)]
+    try:
+        response = _post(pool_client)
+    finally:
+        for stream in held:
+            stream.close()
+
+    assert response.status_code == 429
+    assert [name for name, _ in _events(response)] == ["hata"]
+
+    # Terk edilen akışların slotları worker bitirince geri gelir
+    deadline = time.monotonic() + 30
+    while pool.frames._free.qsize() < slot_count and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert pool.frames._free.qsize() == slot_count
+    assert _events(_post(pool_client))[-1][0] == "tamamlandi"
+
+def test_stream_worker_died(pool_client, web_app, monkeypatch):
+    def worker_died(*args, **kwargs):
+        raise WorkerDied("Çalışan analiz worker'ı yok")
+
+    monkeypatch.setattr(web_app.analysis_pool, "analyze_stream", worker_died)
+    response = _post(pool_client)
+
+    assert response.status_code == 503
+    events = _events(response)
+    assert [name for name, _ in events] == ["hata"]
+    assert "yarıda kesildi" in events[0][1]["error"]
@@ -1,32 +1,131 @@
 from fastapi import FastAPI, File, UploadFile, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from PIL import Image
 import io
 import os
+import json
 import time
+import uuid
 import logging
-from analiz import raf_analizi_yap
+import importlib
 import numpy as np
+from inference_profile import INFERENCE_SETTINGS
+from shm_transport import AnalysisWorkerPool, PoolExhausted, WorkerDied
+
+# Analiz modülü (varsayılan: analiz). Yük testi için ANALIZ_MODULE=stub_backend
+ANALIZ_MODULE = os.environ.get("ANALIZ_MODULE", "analiz")
+analiz_modulu = importlib.import_module(ANALIZ_MODULE)
+raf_analizi_yap = analiz_modulu.raf_analizi_yap
+raf_analizi_akisi = analiz_modulu.raf_analizi_akisi
+
+# Dizinler
+STATIC_DIR = os.environ.get("STATIC_DIR", "static")  # Yük testi geçici dizin kullanır
+TEMPLATES_DIR = "templates"
+
+# Static dizini oluştur (mount etmeden önce var olmalı)
+os.makedirs(STATIC_DIR, exist_ok=True)
 
 # FastAPI uygulaması
 app = FastAPI(title="Ürün Tanıma Sistemi")
 
 # Static dosyalar ve templates
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Dizinler
-STATIC_DIR = "static"
-TEMPLATES_DIR = "templates"
+# Süreç dışı analiz (analysis_pool açıksa paylaşımlı bellek üzerinden)
+SLOT_WAIT_S = 5           # Boş slot bekleme süresi, aşılırsa 429
+ANALYSIS_TIMEOUT_S = 120  # Tek analiz için üst sınır
+analysis_pool = None
 
-# Static dizini oluştur
-os.makedirs(STATIC_DIR, exist_ok=True)
+@app.on_event("startup")
+def start_analysis_pool():
+    global analysis_pool
+    # Havuz, profildeki (autotune ile ayarlanan) workers sayısı kadar süreç
+    # kullanır; uvicorn bu durumda tek süreçte çalışır, böylece toplam thread
+    # sayısı threads x workers olarak kalır
+    worker_count = int(INFERENCE_SETTINGS["workers"])
+    if INFERENCE_SETTINGS["analysis_pool"] and worker_count > 0:
+        analysis_pool = AnalysisWorkerPool(
+            ANALIZ_MODULE,
+            worker_count,
+            slot_count=worker_count * 2,  # Worker başına biri işlenirken biri hazırlanır
+            slot_bytes=int(INFERENCE_SETTINGS["shm_slot_mb"]) * 1024 * 1024
+        )
+        logger.info(f"{worker_count} analiz worker'ı başlatıldı")
+
+@app.on_event("shutdown")
+def stop_analysis_pool():
+    global analysis_pool
+    if analysis_pool is not None:
+        analysis_pool.close()
+        analysis_pool = None
+
+def _gorseli_coz(contents):
+    """
+    Yüklenen dosyayı RGB NumPy dizisine çevirir
+    """
+    pil_image = Image.open(io.BytesIO(contents))
+    
+    # RGB'ye çevir
+    if pil_image.mode != 'RGB':
+        pil_image = pil_image.convert('RGB')
+    
+    # NumPy array'e çevir
+    return np.array(pil_image)
+
+def _cikti_yolu():
+    """
+    İşlenmiş görsel için benzersiz dosya adı ve yolu (eşzamanlı isteklerde çakışmaz)
+    """
+    out_name = f"analiz_{int(time.time())}_{uuid.uuid4().hex[:8]}.jpg"
+    return out_name, os.path.join(STATIC_DIR, out_name)
+
+def _gorseli_kaydet(sonuc, out_path):
+    """
+    İşlenmiş görseli JPEG olarak kaydeder
+    
+    Returns:
+        bool: Kaydedildiyse True
+    """
+    try:
+        Image.fromarray(sonuc.get("gorsel")).save(out_path, format="JPEG")
+        logger.info(f"İşlenmiş görsel kaydedildi: {out_path}")
+        return True
+    except Exception:
+        logger.exception("İşlenmiş görsel kaydedilemedi")
+        return False
+
+def _analiz_et_ve_kaydet(np_rgb, enhance, use_ensemble, out_path):
+    """
+    Analizi çalıştırır ve başarılıysa işlenmiş görseli kaydeder. Worker
+    havuzu varsa görsel paylaşımlı bellekten kopyalanmadan kaydedilir.
+    
+    Returns:
+        tuple: (analiz_sonucu, görsel_kaydedildi_mi)
+    """
+    if analysis_pool is not None and analysis_pool.fits(np_rgb):
+        with analysis_pool.analyze(
+            np_rgb,
+            acquire_timeout=SLOT_WAIT_S,
+            timeout=ANALYSIS_TIMEOUT_S,
+            enhance=enhance,
+            use_ensemble=use_ensemble
+        ) as sonuc:
+            if isinstance(sonuc, dict) and "error" in sonuc:
+                return sonuc, False
+            return sonuc, _gorseli_kaydet(sonuc, out_path)
+
+    sonuc = raf_analizi_yap(np_rgb, enhance=enhance, use_ensemble=use_ensemble)
+    if isinstance(sonuc, dict) and "error" in sonuc:
+        return sonuc, False
+    return sonuc, _gorseli_kaydet(sonuc, out_path)
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
@@ -43,20 +142,45 @@ async def upload_file(
     try:
         # Dosya okuma
         contents = await file.read()
-        pil_image = Image.open(io.BytesIO(contents))
-        
-        # RGB'ye çevir
-        if pil_image.mode != 'RGB':
-            pil_image = pil_image.convert('RGB')
-        
-        # NumPy array'e çevir
-        np_rgb = np.array(pil_image)
+        np_rgb = _gorseli_coz(contents)
         
         logger.info(f"Analiz başlıyor... Kontrast: {enhance}, Ensemble: {use_ensemble}")
         
-        # Basit analiz
-        sonuc = raf_analizi_yap(np_rgb, enhance=enhance, use_ensemble=use_ensemble)
+        # Görsel yolu
+        out_name, out_path = _cikti_yolu()
+        
+        # Analiz ve görsel kaydı
+        if analysis_pool is not None:
+            try:
+                sonuc, kaydedildi = await run_in_threadpool(
+                    _analiz_et_ve_kaydet, np_rgb, enhance, use_ensemble, out_path
+                )
+            except PoolExhausted:
+                logger.warning("Analiz worker'ları meşgul, istek reddedildi")
+                return templates.TemplateResponse(
+                    "index.html",
+                    {"request": request, "error": "Sunucu meşgul, lütfen tekrar deneyin."},
+                    status_code=429
+                )
+            except WorkerDied as e:
+                logger.error(f"Analiz worker'ı sonlandı: {e}")
+                return templates.TemplateResponse(
+                    "index.html",
+                    {"request": request, "error": "Analiz yarıda kesildi, lütfen tekrar deneyin."},
+                    status_code=503
+                )
+            except TimeoutError:
+                logger.error("Analiz zaman aşımına uğradı, worker yeniden başlatıldı")
+                return templates.TemplateResponse(
+                    "index.html",
+                    {"request": request, "error": "Analiz zaman aşımına uğradı, lütfen tekrar deneyin."},
+                    status_code=504
+                )
+        else:
+            sonuc, kaydedildi = _analiz_et_ve_kaydet(np_rgb, enhance, use_ensemble, out_path)
         logger.info("Analiz tamamlandı.")
+        if isinstance(sonuc, dict) and "raf_atlama_orani" in sonuc:
+            logger.info(f"Ön kontrolde atlanan raf: {sonuc['atlanan_raf']} (oran: {sonuc['raf_atlama_orani']:.0%})")
         
         if isinstance(sonuc, dict) and "error" in sonuc:
             logger.error(f"Analiz hata: {sonuc['error']}")
@@ -65,28 +189,19 @@ async def upload_file(
                 {"request": request, "error": sonuc["error"]}
             )
         
+        if not kaydedildi:
+            return templates.TemplateResponse(
+                "index.html",
+                {"request": request, "error": "Analiz görseli kaydedilemedi."}
+            )
+        
         # Analizden gelen raf bazlı sonuçları doğrudan kullan
         raf_listesi = sonuc.get("raf_bilgileri", [])
         toplam_urun = sonuc.get("toplam_urun", 0)
-        gorsel_rgb = sonuc.get("gorsel")
 
         # Şablon doğrudan raf_listesi üzerinde dönecek
         raf_render_list = raf_listesi
         
-        # Görseli kaydet
-        out_name = f"analiz_{int(time.time())}.jpg"
-        out_path = os.path.join(STATIC_DIR, out_name)
-        
-        try:
-            Image.fromarray(gorsel_rgb).save(out_path, format="JPEG")
-            logger.info(f"İşlenmiş görsel kaydedildi: {out_path}")
-        except Exception as e:
-            logger.exception("İşlenmiş görsel kaydedilemedi")
-            return templates.TemplateResponse(
-                "index.html",
-                {"request": request, "error": "Analiz görseli kaydedilemedi."}
-            )
-        
         return templates.TemplateResponse(
             "index.html",
             {
@@ -104,8 +219,127 @@ async def upload_file(
             {"request": request, "error": f"Beklenmeyen hata: {str(e)}"}
         )
 
+def _sse_olayi(olay, veri):
+    """
+    Server-Sent Events formatında tek bir olay oluşturur
+    """
+    return f"event: {olay}\ndata: {json.dumps(veri, ensure_ascii=False)}\n\n"
+
+def _analiz_olaylari(olaylar):
+    """
+    Analiz adımlarını SSE olayları olarak üretir. Son adımda görsel
+    kaydedilir ve toplamlarla birlikte "tamamlandi" olayı gönderilir.
+    
+    Args:
+        olaylar: raf_analizi_akisi olayları (süreç içi veya worker havuzundan)
+    """
+    try:
+        for olay, veri in olaylar:
+            if olay != "sonuc":
+                yield _sse_olayi(olay, veri)
+                continue
+            
+            if "error" in veri:
+                logger.error(f"Analiz hata: {veri['error']}")
+                yield _sse_olayi("hata", {"error": veri["error"]})
+                return
+            
+            out_name, out_path = _cikti_yolu()
+            if not _gorseli_kaydet(veri, out_path):
+                yield _sse_olayi("hata", {"error": "Analiz görseli kaydedilemedi."})
+                return
+            
+            logger.info("Analiz tamamlandı.")
+            tamamlandi = {
+                "toplam_urun": veri.get("toplam_urun", 0),
+                "raf_sayisi": len(veri.get("raf_bilgileri", [])),
+                "atlanan_raf": veri.get("atlanan_raf", 0),
+                "image_url": f"/static/{out_name}",
+            }
+            # Tüm kutular sütun bazlı (sınıf isimleri bir kez)
+            if veri.get("tespitler") is not None:
+                tamamlandi["tespitler"] = veri["tespitler"].to_dict()
+            yield _sse_olayi("tamamlandi", tamamlandi)
+    except WorkerDied as e:
+        logger.error(f"Analiz worker'ı sonlandı: {e}")
+        yield _sse_olayi("hata", {"error": "Analiz yarıda kesildi, lütfen tekrar deneyin."})
+    except TimeoutError:
+        logger.error("Analiz zaman aşımına uğradı, worker yeniden başlatıldı")
+        yield _sse_olayi("hata", {"error": "Analiz zaman aşımına uğradı, lütfen tekrar deneyin."})
+    except Exception as e:
+        logger.exception("Beklenmeyen hata")
+        yield _sse_olayi("hata", {"error": f"Beklenmeyen hata: {str(e)}"})
+    finally:
+        # Havuz akışında slotu istemci bağlantıyı kesse bile bırak
+        if hasattr(olaylar, "close"):
+            olaylar.close()
+
+@app.post("/upload/stream")
+async def upload_stream(
+    file: UploadFile = File(...),
+    enhance: bool = Form(False),
+    use_ensemble: bool = Form(False),
+):
+    """
+    Analizi Server-Sent Events olarak akıtır: buzdolabi, raf_sinirlari,
+    her raf için raf, sonunda tamamlandi (veya hata)
+    """
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    try:
+        contents = await file.read()
+        np_rgb = _gorseli_coz(contents)
+    except Exception as e:
+        logger.exception("Görsel okunamadı")
+        return StreamingResponse(
+            iter([_sse_olayi("hata", {"error": f"Görsel okunamadı: {str(e)}"})]),
+            media_type="text/event-stream",
+            headers=headers
+        )
+    
+    logger.info(f"Akışlı analiz başlıyor... Kontrast: {enhance}, Ensemble: {use_ensemble}")
+    
+    if analysis_pool is not None and analysis_pool.fits(np_rgb):
+        # Slot hemen alınır; havuz doluysa akış başlamadan 429 döner
+        try:
+            olaylar = await run_in_threadpool(
+                analysis_pool.analyze_stream,
+                np_rgb,
+                acquire_timeout=SLOT_WAIT_S,
+                timeout=ANALYSIS_TIMEOUT_S,
+                enhance=enhance,
+                use_ensemble=use_ensemble
+            )
+        except PoolExhausted:
+            logger.warning("Analiz worker'ları meşgul, istek reddedildi")
+            return StreamingResponse(
+                iter([_sse_olayi("hata", {"error": "Sunucu meşgul, lütfen tekrar deneyin."})]),
+                media_type="text/event-stream",
+                headers=headers,
+                status_code=429
+            )
+        except WorkerDied as e:
+            logger.error(f"Analiz worker'ı sonlandı: {e}")
+            return StreamingResponse(
+                iter([_sse_olayi("hata", {"error": "Analiz yarıda kesildi, lütfen tekrar deneyin."})]),
+                media_type="text/event-stream",
+                headers=headers,
+                status_code=503
+            )
+    else:
+        olaylar = raf_analizi_akisi(np_rgb, enhance=enhance, use_ensemble=use_ensemble)
+    
+    # Senkron üretici StreamingResponse tarafından threadpool'da çalıştırılır
+    return StreamingResponse(
+        _analiz_olaylari(olaylar),
+        media_type="text/event-stream",
+        headers=headers
+    )
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("web_app:app", host="127.0.0.1", port=8001, reload=True)
+    # Worker sayısı çıkarım profilinden gelir (reload tek süreçte çalışır).
+    # Analiz havuzu açıksa worker'lar havuzdadır, uvicorn tek süreçtir.
+    workers = 1 if INFERENCE_SETTINGS["analysis_pool"] else int(INFERENCE_SETTINGS["workers"])
+    uvicorn.run("web_app:app", host="127.0.0.1", port=8001, reload=workers <= 1, workers=workers)
 
 